@@ -7,6 +7,7 @@ from rest_framework.decorators import permission_classes
 from rest_framework.permissions import IsAuthenticated
 from apps.ActivityLog.models import ActivityLog, LoginActivity
 from apps.ActivityLog.serializers import ActivityLogSerializer, ListActivityLogSerializer, LoginActivitySerializer
+from ipment.pagination import keyset_page, page_params, page_response
 
 # @csrf_exempt
 @login_required
@@ -32,6 +33,15 @@ def activityLogApi(request, method=None, id=None):
     elif method == 'list-act':
         if request.method == 'GET':
             activityLog = ActivityLog.objects.all()
+
+            # With 'limit' or 'cursor', return one page ordered by id
+            page = page_params(request)
+            if isinstance(page, str):
+                return JsonResponse(page, status=400, safe=False)
+            if page is not None:
+                activityLog, next_key = keyset_page(activityLog, *page)
+                return page_response(ListActivityLogSerializer(activityLog, many=True).data, next_key)
+
             activityLogSerializer = ListActivityLogSerializer(activityLog, many=True)
             return JsonResponse(activityLogSerializer.data, safe=False)
         else:
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ConfigurationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.Configuration'
+
+    def ready(self):
+        import apps.Configuration.signals  # Import the signals when the app is ready
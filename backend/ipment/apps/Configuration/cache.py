@@ -0,0 +1,90 @@
+import time
+from django.db import transaction
+from django.db.models import F
+from apps.Configuration.models import ConfigurationVersion, Label, MeasurementUnit
+from apps.iPM.models import collation_key
+
+# Seconds a process trusts its cache before reading the version counter again; changes
+# made by the process itself are seen at once
+VERSION_CHECK_TTL = 2
+
+# Unit used when MeasurementUnit id=1 does not exist
+DEFAULT_UNIT = 'bit'
+
+# Configuration of this process, see current_config
+_config = None
+
+
+class Config:
+    """
+    Labels and active unit loaded at one version of the configuration. The label maps are
+    keyed by collation_key, so they match names and labels the way the database compares them.
+    """
+
+    def __init__(self, version):
+        self.version = version
+        self.checked_at = time.monotonic()
+        self.label_by_circuit = {}
+        self.circuit_by_label = {}
+        for circuit, label in Label.objects.values_list('circuit', 'label'):
+            self.label_by_circuit[collation_key(circuit)] = label
+            self.circuit_by_label[collation_key(label)] = circuit
+        unit = MeasurementUnit.objects.filter(id=1).values_list('unit', flat=True).first()
+        if unit is None:
+            print(f"Warning: MeasurementUnit with id=1 not found. Defaulting to '{DEFAULT_UNIT}'.")
+        self.unit = unit or DEFAULT_UNIT
+
+
+def read_version():
+    return ConfigurationVersion.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+
+def current_config():
+    """
+    Return the configuration of this process, loaded in bulk (one query for the labels and
+    one for the unit) and reloaded when the version counter has moved.
+    """
+    global _config
+    if _config is None:
+        _config = Config(read_version())
+    elif time.monotonic() - _config.checked_at > VERSION_CHECK_TTL:
+        version = read_version()
+        if version != _config.version:
+            _config = Config(version)
+        else:
+            _config.checked_at = time.monotonic()
+    return _config
+
+
+def invalidate():
+    """
+    Bump the version counter once the current transaction commits, so that every process
+    reloads its configuration, and drop the configuration of this process at once.
+    """
+    global _config
+    _config = None
+
+    def bump():
+        global _config
+        if not ConfigurationVersion.objects.filter(pk=1).update(version=F('version') + 1):
+            ConfigurationVersion.objects.get_or_create(pk=1, defaults={'version': 1})
+        _config = None
+
+    transaction.on_commit(bump)
+
+
+def label_for_circuit(name):
+    """Return the label of a circuit name, or the name itself when it has none."""
+    if name is None:
+        return name
+    return current_config().label_by_circuit.get(collation_key(name), name)
+
+
+def circuit_for_label_or_name(circuit_or_label):
+    """Return the circuit name of a label, or the given text when it is not a label."""
+    return current_config().circuit_by_label.get(collation_key(circuit_or_label), circuit_or_label)
+
+
+def measurement_unit():
+    """Return the active measurement unit (MeasurementUnit id=1), 'bit' if it is not set."""
+    return current_config().unit
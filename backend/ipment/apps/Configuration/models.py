@@ -24,4 +24,13 @@ class Label(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
-        return f"{self.label} - {self.circuit}"
\ No newline at end of file
+        return f"{self.label} - {self.circuit}"
+
+class ConfigurationVersion(models.Model):
+    # Single row (id=1) bumped on every Label/MeasurementUnit change, so that each process
+    # knows when its configuration cache (apps/Configuration/cache.py) is stale
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return str(self.version)
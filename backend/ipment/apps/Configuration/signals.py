@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from apps.Configuration.cache import invalidate
+from apps.Configuration.models import Label, MeasurementUnit
+
+# Signal to invalidate the configuration cache of every process when a label or unit changes
+@receiver(post_save, sender=Label)
+@receiver(post_delete, sender=Label)
+@receiver(post_save, sender=MeasurementUnit)
+@receiver(post_delete, sender=MeasurementUnit)
+def invalidate_configuration(sender, **kwargs):
+    """
+    Signal handler to bump the configuration version after a Label or MeasurementUnit
+    is saved or deleted.
+    """
+    invalidate()
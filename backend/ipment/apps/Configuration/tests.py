@@ -0,0 +1,12 @@
+from django.test import TransactionTestCase
+from apps.Configuration import cache
+from apps.Configuration.models import Label
+
+
+class LabelCacheTests(TransactionTestCase):
+    def test_labels_match_like_the_database(self):
+        Label.objects.create(circuit='R1/Gi0/1', label='Core Uplink')
+        self.assertEqual(cache.label_for_circuit('r1/gi0/1'), 'Core Uplink')
+        self.assertEqual(cache.circuit_for_label_or_name('core uplink'), 'R1/Gi0/1')
+        self.assertEqual(cache.circuit_for_label_or_name('R2/Gi0/1'), 'R2/Gi0/1')
+        self.assertIsNone(cache.label_for_circuit(None))
@@ -8,6 +8,7 @@ from rest_framework.decorators import permission_classes
 from rest_framework.permissions import IsAuthenticated
 from apps.Configuration.models import Label
 from apps.Configuration.serializers import LabelSerializer
+from ipment.pagination import keyset_page, page_params, page_response
 from apps.ActivityLog.models import ActivityLog
 from django.db import connection
 import json
@@ -91,6 +92,15 @@ def labelApi(request, method=None, id=None):
     elif method == 'list':
         if request.method == 'GET':
             labels = Label.objects.all()
+
+            # With 'limit' or 'cursor', return one page ordered by id
+            page = page_params(request)
+            if isinstance(page, str):
+                return JsonResponse(page, status=400, safe=False)
+            if page is not None:
+                labels, next_key = keyset_page(labels, *page)
+                return page_response(LabelSerializer(labels, many=True).data, next_key)
+
             labelSerializer = LabelSerializer(labels, many=True)
             return JsonResponse(labelSerializer.data, safe=False)
         else:
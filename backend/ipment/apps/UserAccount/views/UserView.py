@@ -7,6 +7,7 @@ from rest_framework.decorators import permission_classes
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth.models import User
 from apps.UserAccount.serializers import UserSerializer, UserListSerializer
+from ipment.pagination import keyset_page, page_params, page_response
 from apps.ActivityLog.models import ActivityLog  # Import the ActivityLog model
 import json  # Import json module to handle changes field
 
@@ -72,6 +73,15 @@ def userApi(request, method=None, id=None):
     elif method == 'list':
         if request.method == 'GET':
             users = User.objects.all()
+
+            # With 'limit' or 'cursor', return one page ordered by id
+            page = page_params(request)
+            if isinstance(page, str):
+                return JsonResponse(page, status=400, safe=False)
+            if page is not None:
+                users, next_key = keyset_page(users, *page)
+                return page_response(UserListSerializer(users, many=True).data, next_key)
+
             userSerializer = UserListSerializer(users, many=True)
             return JsonResponse(userSerializer.data, safe=False)
         else:
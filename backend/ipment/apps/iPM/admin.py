@@ -1,5 +1,15 @@
 from django.contrib import admin
-from .models import Dashboard, Data
+from .models import ArchivedDay, Circuit, CircuitLatest, CompactionMark, Dashboard, Data, DataRollup5m, DataRollupHour, DataRollupDay, DeleteJob, IngestArchive, IngestMember
 
+admin.site.register(ArchivedDay)
 admin.site.register(Dashboard)
-admin.site.register(Data)
\ No newline at end of file
+admin.site.register(Circuit)
+admin.site.register(CircuitLatest)
+admin.site.register(CompactionMark)
+admin.site.register(Data)
+admin.site.register(DataRollup5m)
+admin.site.register(DataRollupHour)
+admin.site.register(DataRollupDay)
+admin.site.register(DeleteJob)
+admin.site.register(IngestArchive)
+admin.site.register(IngestMember)
\ No newline at end of file
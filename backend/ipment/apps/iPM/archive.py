@@ -0,0 +1,169 @@
+import os
+import logging
+import tempfile
+from datetime import datetime, timezone as dt_timezone
+import numpy as np
+from django.conf import settings
+from apps.iPM.models import ArchivedDay
+
+logger = logging.getLogger(__name__)
+
+# Columns of an archive file, sorted by circuit then time. Files are plain (uncompressed)
+# .npy so they can be memory-mapped: a read only touches the pages of the rows it needs.
+ARCHIVE_DTYPE = np.dtype([
+    ('circuit', '<i8'),
+    ('time', '<i8'),  # Seconds since the epoch, UTC
+    ('inbound', '<f8'),  # Whole bit/s, exact in a double up to 2**53, NaN when missing
+    ('outbound', '<f8'),
+])
+
+
+# Up to this many circuits, their slices are found by binary search instead of a full scan
+SEARCH_CIRCUITS = 64
+
+
+def day_path(day):
+    """Return the archive file of a UTC day: <IPM_ARCHIVE_DIR>/<year>/<YYYY-MM-DD>.npy"""
+    return os.path.join(settings.IPM_ARCHIVE_DIR, f"{day:%Y}", f"{day:%Y-%m-%d}.npy")
+
+
+def utc_day(value):
+    return value.astimezone(dt_timezone.utc).date()
+
+
+def epoch_seconds(value):
+    return int(value.timestamp())
+
+
+def from_epoch_seconds(seconds):
+    return datetime.fromtimestamp(int(seconds), tz=dt_timezone.utc)
+
+
+def to_array(rows):
+    """Build a sorted archive array from (circuit id, time, inbound rate, outbound rate) rows, missing rates as NaN."""
+    array = np.array(
+        [
+            (circuit_id, epoch_seconds(time_obj), np.nan if inbound is None else inbound, np.nan if outbound is None else outbound)
+            for circuit_id, time_obj, inbound, outbound in rows
+        ],
+        dtype=ARCHIVE_DTYPE
+    )
+    array.sort(order=['circuit', 'time'])
+    return array
+
+
+def merge_arrays(old, new):
+    """Merge two archive arrays, rows of `new` replacing the rows of `old` with the same circuit and time."""
+    if old is None or not len(old):
+        return new
+    combined = np.concatenate([new, old])
+    # np.unique returns the first occurrence (from `new`) of each key, sorted by circuit and time
+    _, first = np.unique(combined[['circuit', 'time']], return_index=True)
+    return combined[first]
+
+
+def load_day(day):
+    """Memory-map the archive file of a day, or return None if there is none."""
+    path = day_path(day)
+    if not os.path.exists(path):
+        return None
+    return np.load(path, mmap_mode='r')
+
+
+def write_day(day, array):
+    """Write (or replace) the archive file of a day atomically, or remove it when `array` is empty."""
+    path = day_path(day)
+    if not len(array):
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.archive-', suffix='.npy')
+    # mkstemp creates the file as 0600 and os.replace keeps it: let the web workers read it
+    os.fchmod(fd, 0o644)
+    with os.fdopen(fd, 'wb') as archive_file:
+        np.save(archive_file, np.ascontiguousarray(array, dtype=ARCHIVE_DTYPE))
+    os.replace(tmp_path, path)
+
+
+def archived_days_between(start, end):
+    """Return the archived UTC days overlapping `start` to `end` (inclusive), oldest first."""
+    return list(
+        ArchivedDay.objects.filter(day__gte=utc_day(start), day__lte=utc_day(end)).order_by('day').values_list('day', flat=True)
+    )
+
+
+def select_circuits(array, circuit_ids):
+    """Return the rows of a (circuit-sorted) archive array belonging to `circuit_ids`, None meaning all."""
+    if circuit_ids is None:
+        return array
+    if len(circuit_ids) > SEARCH_CIRCUITS:
+        return array[np.isin(array['circuit'], list(circuit_ids))]
+    circuits = array['circuit']
+    parts = []
+    for circuit_id in sorted(circuit_ids):
+        lo = np.searchsorted(circuits, circuit_id, side='left')
+        hi = np.searchsorted(circuits, circuit_id, side='right')
+        if hi > lo:
+            parts.append(array[lo:hi])
+    return np.concatenate(parts) if parts else array[:0]
+
+
+def read_range(start, end, circuit_ids=None, end_inclusive=True):
+    """
+    Return the archived rows between `start` and `end` as an in-memory archive array,
+    limited to `circuit_ids` (None meaning all circuits). Only the archive files of the
+    days in the range are opened, and only the slices of the wanted circuits are read.
+    """
+    first = epoch_seconds(start)
+    last = epoch_seconds(end)
+    parts = []
+    for day in archived_days_between(start, end):
+        array = load_day(day)
+        if array is None:
+            continue
+        rows = select_circuits(array, circuit_ids)
+        times = rows['time']
+        mask = (times >= first) & ((times <= last) if end_inclusive else (times < last))
+        if mask.any():
+            parts.append(np.array(rows[mask]))
+    return np.concatenate(parts) if parts else np.empty(0, dtype=ARCHIVE_DTYPE)
+
+
+def delete_archived(start=None, end=None, circuit_ids=None):
+    """
+    Delete archived rows between `start` and `end` (inclusive, None meaning no bound) for
+    `circuit_ids` (None meaning all circuits), rewriting the affected day files.
+    Returns the number of deleted rows.
+    """
+    if circuit_ids is not None and not circuit_ids:
+        return 0
+    days = ArchivedDay.objects.all()
+    if start is not None:
+        days = days.filter(day__gte=utc_day(start))
+    if end is not None:
+        days = days.filter(day__lte=utc_day(end))
+
+    total = 0
+    for archived_day in days:
+        array = load_day(archived_day.day)
+        if array is None:
+            continue
+        delete = np.ones(len(array), dtype=bool)
+        if start is not None:
+            delete &= array['time'] >= epoch_seconds(start)
+        if end is not None:
+            delete &= array['time'] <= epoch_seconds(end)
+        if circuit_ids is not None:
+            delete &= np.isin(array['circuit'], list(circuit_ids))
+        count = int(delete.sum())
+        if not count:
+            continue
+        kept = np.array(array[~delete])
+        del array  # Release the memory map before replacing the file
+        write_day(archived_day.day, kept)
+        archived_day.rows = len(kept)
+        archived_day.save()
+        total += count
+        logger.info(f"Deleted {count} archived rows of {archived_day.day}")
+    return total
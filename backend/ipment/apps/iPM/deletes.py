@@ -0,0 +1,141 @@
+import logging
+import threading
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from apps.ActivityLog.models import ActivityLog
+from apps.iPM.archive import delete_archived
+from apps.iPM.latest import refresh_latest
+from apps.iPM.models import Circuit, CircuitLatest, Data, DeleteJob
+from apps.iPM.rollups import ROLLUPS, delete_rollups_range
+
+logger = logging.getLogger(__name__)
+
+# Data rows deleted per transaction
+CHUNK_SIZE = 10000
+
+# Deleted ids are kept as [first id, last id, count] entries, up to this many
+ID_RANGES_MAX = 100
+
+
+def job_circuit_ids(filters):
+    return Circuit.objects.filter(name__icontains=filters['circuit']).values('id')
+
+
+def job_queryset(filters):
+    """Return the Data rows matching the filters of a delete job."""
+    if 'circuit' in filters:
+        return Data.objects.filter(circuit__in=job_circuit_ids(filters))
+    return Data.objects.filter(time__range=(parse_datetime(filters['start_date']), parse_datetime(filters['end_date'])))
+
+
+def add_id_range(ranges, ids):
+    """
+    Add a chunk of deleted ids, as one [first id, last id, count] entry, to a list of entries
+    sorted by first id. Ids of a chunk are interleaved with other circuits' ids, so the entry
+    only bounds them. Beyond ID_RANGES_MAX entries, the neighbours spanning the fewest ids
+    together are merged: the entries get coarser but still bound the deleted ids and count
+    them exactly.
+    """
+    ranges = sorted(ranges + [[min(ids), max(ids), len(ids)]])
+    while len(ranges) > ID_RANGES_MAX:
+        index = min(range(len(ranges) - 1), key=lambda i: max(ranges[i][1], ranges[i + 1][1]) - ranges[i][0])
+        first, last, count = ranges[index]
+        _, next_last, next_count = ranges[index + 1]
+        ranges[index:index + 2] = [[first, max(last, next_last), count + next_count]]
+    return ranges
+
+
+def start_delete_job(user, filters):
+    """
+    Record a delete job for the given filters and run it in a background thread once the
+    current transaction commits. Returns the job; `run_delete_jobs` picks up jobs left
+    unfinished by a restart.
+    """
+    job = DeleteJob.objects.create(user=user, filters=filters, total=job_queryset(filters).count())
+    transaction.on_commit(lambda: threading.Thread(target=run_delete_job_thread, args=(job.pk,), daemon=True).start())
+    return job
+
+
+def run_delete_job_thread(job_id):
+    try:
+        run_delete_job(job_id)
+    finally:
+        connection.close()
+
+
+def run_delete_job(job_id, chunk_size=CHUNK_SIZE):
+    """
+    Delete the Data rows of a job in chunks of ids, each in its own short transaction, and
+    record the progress on the job after each chunk. The rollups, newest samples and the
+    cold archive are updated once all rows are gone, then the deletion is logged with its
+    filters and row count. Running a stopped job again continues where it stopped.
+    Each transaction locks the job row first and adds to the counts read under the lock,
+    so runners of the same job (a restart while its thread still runs) take turns on the
+    chunks, and only the first one to finish updates the rest and logs the deletion.
+    """
+    DeleteJob.objects.filter(pk=job_id).exclude(status='done').update(status='running', updated_at=timezone.now())
+    job = DeleteJob.objects.get(pk=job_id)
+    if job.status == 'done':
+        return job
+
+    try:
+        filters = job.filters
+        queryset = job_queryset(filters)
+        while True:
+            with transaction.atomic():
+                job = DeleteJob.objects.select_for_update().get(pk=job_id)
+                if job.status == 'done':
+                    return job
+                ids = list(queryset.values_list('id', flat=True)[:chunk_size])
+                if not ids:
+                    break
+                Data.objects.filter(id__in=ids).delete()
+                job.deleted += len(ids)
+                job.id_ranges = add_id_range(job.id_ranges or [], ids)
+                job.save(update_fields=['deleted', 'id_ranges', 'updated_at'])
+            logger.info(f"Delete job {job.pk}: {job.deleted} of {job.total} rows deleted")
+
+        with transaction.atomic():
+            job = DeleteJob.objects.select_for_update().get(pk=job_id)
+            if job.status == 'done':
+                return job
+            if 'circuit' in filters:
+                for _, _, rollup_model in ROLLUPS:
+                    rollup_model.objects.filter(circuit__in=job_circuit_ids(filters)).delete()
+                CircuitLatest.objects.filter(circuit__in=job_circuit_ids(filters)).delete()
+            else:
+                start_date = parse_datetime(filters['start_date'])
+                end_date = parse_datetime(filters['end_date'])
+                delete_rollups_range(start_date, end_date)
+                refresh_latest(list(
+                    CircuitLatest.objects.filter(time__range=(start_date, end_date)).values_list('circuit_id', flat=True)
+                ))
+            if 'circuit' in filters:
+                archived = delete_archived(circuit_ids=set(Circuit.objects.filter(id__in=job_circuit_ids(filters)).values_list('id', flat=True)))
+            else:
+                archived = delete_archived(parse_datetime(filters['start_date']), parse_datetime(filters['end_date']))
+
+            job.deleted += archived
+            job.status = 'done'
+            job.save()
+            # Log the deletion: its filters and counts, and the id ranges of the deleted rows
+            ActivityLog.objects.create(
+                user=job.user,
+                method='delete',
+                module='iPM',
+                model='Data',
+                record_id=job.pk,
+                changes={
+                    'job': job.pk,
+                    'filters': filters,
+                    'deleted': job.deleted,
+                    'archived_deleted': archived,
+                    'id_ranges': job.id_ranges,
+                }
+            )
+    except Exception as e:
+        logger.exception(f"Delete job {job_id} failed")
+        DeleteJob.objects.filter(pk=job_id).exclude(status='done').update(status='failed', error=str(e), updated_at=timezone.now())
+        job = DeleteJob.objects.get(pk=job_id)
+    return job
@@ -0,0 +1,70 @@
+import numpy as np
+
+# Downsampling methods of the `list` max_points parameter:
+# - 'lttb': Largest-Triangle-Three-Buckets, keeps real samples that preserve the shape of the series
+# - 'minmax': fixed time buckets, each returned as its average with the min and max of the bucket
+METHODS = ['lttb', 'minmax']
+
+
+def scaled(values):
+    """Scale columns to [0, 1] so that time and rates weigh the same in the triangle areas."""
+    low = values.min(axis=0)
+    span = values.max(axis=0) - low
+    span[span == 0] = 1
+    return (values - low) / span
+
+
+def lttb_indices(times, rates, max_points):
+    """
+    Return the indices of the `max_points` samples kept by Largest-Triangle-Three-Buckets.
+    `times` is a sorted (n,) array and `rates` an (n, k) array: with several rate columns
+    (inbound and outbound), the triangle areas are taken in k + 1 dimensions so that the
+    shape of every column is preserved. The first and last samples are always kept.
+    """
+    count = len(times)
+    if max_points >= count:
+        return np.arange(count)
+    if max_points < 3:
+        return np.array([0, count - 1][:max_points])
+
+    points = scaled(np.column_stack([times, rates]).astype(np.float64))
+    # Buckets of the samples between the first and last one, and their centroids
+    starts = np.floor(np.linspace(1, count - 1, max_points - 1)).astype(np.int64)
+    lengths = np.diff(starts)
+    centroids = np.add.reduceat(points[1:count - 1], starts[:-1] - 1) / lengths[:, None]
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = count - 1
+    previous = points[0]
+    for bucket in range(max_points - 2):
+        lo, hi = starts[bucket], starts[bucket + 1]
+        following = centroids[bucket + 1] if bucket + 1 < len(centroids) else points[count - 1]
+        # Twice the area of the triangles (previous, candidate, following centroid):
+        # the norm of the wedge product of the two edges from `previous`
+        edges = points[lo:hi] - previous
+        span = following - previous
+        cross = edges[:, :, None] * span[None, None, :] - edges[:, None, :] * span[None, :, None]
+        areas = np.einsum('ijk,ijk->i', cross, cross)
+        best = lo + int(np.argmax(areas))
+        selected[bucket + 1] = best
+        previous = points[best]
+    return selected
+
+
+def minmax_buckets(times, rates, max_points):
+    """
+    Split a sorted series into `max_points` buckets of equal duration and return, for the
+    non-empty ones, a (bucket start times, averages, minimums, maximums) tuple of arrays.
+    """
+    first = times[0]
+    width = max((times[-1] - first) / max_points, 1)
+    buckets = np.minimum(((times - first) // width).astype(np.int64), max_points - 1)
+    starts = np.flatnonzero(np.concatenate([[True], buckets[1:] != buckets[:-1]]))
+    counts = np.diff(np.append(starts, len(times)))
+    return (
+        first + buckets[starts] * width,
+        np.add.reduceat(rates, starts) / counts[:, None],
+        np.minimum.reduceat(rates, starts),
+        np.maximum.reduceat(rates, starts),
+    )
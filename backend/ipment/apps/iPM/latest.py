@@ -0,0 +1,71 @@
+import time
+from django.db import connection
+from django.db.models import Max
+from apps.iPM.models import CircuitLatest, Data
+
+# Seconds the newest sample time is kept in memory by each process
+LATEST_TIME_TTL = 10
+
+# (time read, newest sample time) of this process, see latest_sample_time
+_latest_time = None
+
+
+def update_latest(rows):
+    """
+    Move the CircuitLatest row of each circuit forward to its newest sample among the given
+    {(circuit id, time): (inbound rate, outbound rate)} rows. Older samples leave it as it is.
+    Call it in the transaction writing the samples: the rows of the circuits are locked, in
+    circuit order, so concurrent batches cannot move a circuit back in time.
+    """
+    newest = {}
+    for (circuit_id, time_obj), rates in rows.items():
+        if circuit_id not in newest or time_obj > newest[circuit_id][0]:
+            newest[circuit_id] = (time_obj, rates)
+    if not newest:
+        return
+
+    current = dict(
+        CircuitLatest.objects.select_for_update().filter(circuit_id__in=newest).order_by('circuit_id').values_list('circuit_id', 'time')
+    )
+    changed = [
+        CircuitLatest(circuit_id=circuit_id, time=time_obj, inbound_rate=rates[0], outbound_rate=rates[1])
+        for circuit_id, (time_obj, rates) in sorted(newest.items())
+        if circuit_id not in current or time_obj >= current[circuit_id]
+    ]
+    CircuitLatest.objects.bulk_create(
+        changed,
+        update_conflicts=True,
+        unique_fields=['circuit'] if connection.features.supports_update_conflicts_with_target else None,
+        update_fields=['time', 'inbound_rate', 'outbound_rate', 'updated_at']
+    )
+
+
+def refresh_latest(circuit_ids):
+    """
+    Recompute the CircuitLatest rows of the given circuits from Data after samples were
+    deleted: one lookup on the unique (circuit, time) index per circuit. Circuits left
+    without samples lose their row.
+    """
+    global _latest_time
+    for circuit_id in circuit_ids:
+        data = Data.objects.filter(circuit_id=circuit_id).order_by('-time').first()
+        if data is None:
+            CircuitLatest.objects.filter(circuit_id=circuit_id).delete()
+        else:
+            CircuitLatest.objects.update_or_create(
+                circuit_id=circuit_id,
+                defaults={'time': data.time, 'inbound_rate': data.inbound_rate, 'outbound_rate': data.outbound_rate}
+            )
+    _latest_time = None
+
+
+def latest_sample_time():
+    """
+    Return the time of the newest sample of all circuits, or None when there is none.
+    It is read from the time index of CircuitLatest (one row per circuit), and kept in
+    memory for LATEST_TIME_TTL seconds.
+    """
+    global _latest_time
+    if _latest_time is None or time.monotonic() - _latest_time[0] > LATEST_TIME_TTL:
+        _latest_time = (time.monotonic(), CircuitLatest.objects.aggregate(latest=Max('time'))['latest'])
+    return _latest_time[1]
@@ -0,0 +1,96 @@
+# command is: python manage.py archive_data --older-than-days 90
+
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+from apps.iPM.archive import load_day, merge_arrays, to_array, utc_day, write_day
+from apps.iPM.models import ArchivedDay, Data
+from apps.iPM.rollups import bucket_start
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Days of Data rows kept in the database
+OLDER_THAN_DAYS = 90
+
+# Rows read from, and deleted from, the database at a time
+CHUNK_SIZE = 10000
+
+class Command(BaseCommand):
+    help = (
+        f'Moves the Data rows of closed UTC days older than --older-than-days to the cold archive '
+        f'in {settings.IPM_ARCHIVE_DIR} (one columnar file per day) and deletes them from the database. '
+        f'Rollups are kept, and list/list-top read archived days from the files.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=OLDER_THAN_DAYS,
+            help=f'Archive the days older than this number of days (default: {OLDER_THAN_DAYS}).'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help=f'Rows read from, and deleted from, the database at a time (default: {CHUNK_SIZE}).'
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs['older_than_days'] < 1:
+            raise CommandError('--older-than-days must be at least 1.')
+        if Data.objects.filter(circuit__isnull=True).exists():
+            raise CommandError('Some Data rows are not linked to a circuit yet, run `python manage.py intern_circuits` first.')
+        chunk_size = max(1, kwargs.get('chunk_size') or CHUNK_SIZE)
+
+        cutoff = bucket_start(timezone.now(), 86400) - timedelta(days=kwargs['older_than_days'])
+        first = Data.objects.filter(time__lt=cutoff).aggregate(first=Min('time'))['first']
+        if first is None:
+            self.stdout.write(self.style.SUCCESS(f'No Data rows older than {cutoff:%Y-%m-%d} to archive.'))
+            return
+
+        day = bucket_start(first, 86400)
+        total = 0
+        while day < cutoff:
+            total += self.archive_day(day, day + timedelta(days=1), chunk_size)
+            day += timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(f'{total} Data rows older than {cutoff:%Y-%m-%d} archived.'))
+
+    def archive_day(self, day, day_end, chunk_size):
+        """
+        Archive one UTC day: write its file first, then record it, then delete its rows.
+        Only the rows read into the file are deleted, one inserted meanwhile stays in the
+        database until the next run. A stopped run is safe to start again: rows still in the
+        database are merged into the existing file (replacing the ones with the same circuit
+        and time).
+        """
+        rows = list(
+            Data.objects.filter(time__gte=day, time__lt=day_end)
+            .values_list('id', 'circuit_id', 'time', 'inbound_rate', 'outbound_rate')
+            .iterator(chunk_size=chunk_size)
+        )
+        if not rows:
+            return 0
+        ids = [row[0] for row in rows]
+        array = to_array(row[1:] for row in rows)
+        del rows
+
+        archived_day = ArchivedDay.objects.filter(day=utc_day(day)).first()
+        if archived_day is not None:
+            array = merge_arrays(load_day(archived_day.day), array)
+        write_day(utc_day(day), array)
+        # From here on, bir rejects samples of this day and reads go to the file
+        ArchivedDay.objects.update_or_create(day=utc_day(day), defaults={'rows': len(array)})
+
+        deleted = 0
+        for start in range(0, len(ids), chunk_size):
+            with transaction.atomic():
+                deleted += Data.objects.filter(id__in=ids[start:start + chunk_size]).delete()[0]
+        logger.info(f"Archived {day:%Y-%m-%d}: {len(array)} rows in the file, {deleted} deleted from the database")
+        return deleted
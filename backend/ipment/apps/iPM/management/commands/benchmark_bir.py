@@ -0,0 +1,154 @@
+# command is: python manage.py benchmark_bir --circuits 2000 --days 1
+# For a quick local run against SQLite, point DJANGO_SETTINGS_MODULE at settings using
+# django.db.backends.sqlite3; the numbers that matter are the ones measured on MySQL.
+
+import os
+import io
+import csv
+import time
+import shutil
+import logging
+import resource
+import tempfile
+import zipfile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from apps.iPM.models import Circuit, IngestArchive
+from apps.iPM.management.commands import bir
+from apps.iPM.management.commands.bir import NAME_COLUMN, INBOUND_COLUMN, OUTBOUND_COLUMN, TIME_COLUMN, BATCH_SIZE, parse_batch
+from apps.iPM.management.commands.generate_exports import CIRCUITS, DAYS, INTERVAL_MINUTES, INTERVALS_PER_FILE, generate_exports
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process and of its finished children, in MB (Linux reports KB)."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024
+
+
+def parse_exports(paths, batch_size):
+    """
+    Read and parse every CSV member like `bir` does, without touching the database.
+    Returns the number of parsed rows.
+    """
+    rows = 0
+    for path in paths:
+        with zipfile.ZipFile(path, 'r') as zip_ref:
+            for member in zip_ref.infolist():
+                with zip_ref.open(member) as raw, io.TextIOWrapper(raw, encoding='utf-8-sig', newline='') as csvfile:
+                    reader = csv.reader(csvfile)
+                    headers = [header.strip() for header in next(reader)]
+                    indexes = [headers.index(column) for column in (NAME_COLUMN, TIME_COLUMN, INBOUND_COLUMN, OUTBOUND_COLUMN)]
+                    raw_batch = []
+                    for row in reader:
+                        raw_batch.append(tuple(row[index] for index in indexes))
+                        if len(raw_batch) >= batch_size:
+                            rows += len(parse_batch(raw_batch)[0])
+                            raw_batch = []
+                    if raw_batch:
+                        rows += len(parse_batch(raw_batch)[0])
+    return rows
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks bir on synthetic NMS exports: rows/s, wall time and peak memory per phase.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--circuits', type=int, default=CIRCUITS, help=f'Number of circuits (default: {CIRCUITS}).')
+        parser.add_argument('--days', type=float, default=DAYS, help=f'Number of days of samples (default: {DAYS}).')
+        parser.add_argument('--interval', type=int, default=INTERVAL_MINUTES, help=f'Minutes between samples (default: {INTERVAL_MINUTES}).')
+        parser.add_argument(
+            '--intervals-per-file',
+            type=int,
+            default=INTERVALS_PER_FILE,
+            help=f'Sample times per ZIP file (default: {INTERVALS_PER_FILE}).'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help=f'bir --batch-size (default: {BATCH_SIZE}).')
+        parser.add_argument('--stream', action='store_true', help='Run bir with --stream.')
+        parser.add_argument('--workers', type=int, default=1, help='bir --workers (default: 1).')
+        parser.add_argument('--prefix', default='BENCH', help='Prefix of the benchmark circuits (default: BENCH).')
+        parser.add_argument('--keep-data', action='store_true', help='Keep the benchmark circuits and rows in the database.')
+
+    def handle(self, *args, **kwargs):
+        prefix = kwargs['prefix']
+        if Circuit.objects.filter(name__startswith=f"{prefix}-RTR-").exists() and not kwargs['keep_data']:
+            raise CommandError(f"Circuits named {prefix}-RTR-* already exist, use another --prefix.")
+
+        generate_options = {
+            'circuits': kwargs['circuits'],
+            'interval': kwargs['interval'],
+            'days': kwargs['days'],
+            'intervals_per_file': kwargs['intervals_per_file'],
+            'prefix': prefix,
+        }
+        bir_options = {
+            'batch_size': kwargs['batch_size'],
+            'stream': kwargs['stream'],
+            'workers': kwargs['workers'],
+            'metrics_log': '',
+            'metrics_file': '',
+        }
+        # Per-row and per-batch INFO logging of bir would be measured as well
+        logging.getLogger(bir.__name__).setLevel(logging.WARNING)
+
+        work_dir = tempfile.mkdtemp(prefix='bir-benchmark-')
+        export_dir = os.path.join(work_dir, 'exports')
+        bir_options['directory'] = export_dir
+        bir_options['dead_letter_dir'] = os.path.join(work_dir, 'dead-letter')
+        results = []
+        try:
+            paths, total_rows = self.run_phase(results, 'generate', lambda: self.generate(export_dir, generate_options))
+            self.run_phase(results, 'parse', lambda: (None, parse_exports(paths, kwargs['batch_size'])))
+            self.run_phase(results, 'ingest', lambda: self.ingest(paths, total_rows, bir_options))
+
+            # Same seed, same files: every row now updates an existing one
+            self.generate(export_dir, generate_options)
+            IngestArchive.objects.filter(name__in=[os.path.basename(path) for path in paths]).delete()
+            self.run_phase(results, 're-ingest', lambda: self.ingest(paths, total_rows, bir_options))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            if not kwargs['keep_data']:
+                self.cleanup(prefix)
+
+        self.stdout.write(f"Database: {connection.vendor}, {kwargs['circuits']} circuits, "
+                          f"batch size {kwargs['batch_size']}, workers {kwargs['workers']}, "
+                          f"{'stream' if kwargs['stream'] or kwargs['workers'] > 1 else 'extract'} mode")
+        self.stdout.write(f"{'Phase':<10} {'Rows':>10} {'Seconds':>9} {'Rows/s':>10} {'Peak RSS MB':>12}")
+        for phase, rows, seconds, rss in results:
+            rate = rows / seconds if seconds > 0 else 0
+            self.stdout.write(f"{phase:<10} {rows:>10} {seconds:>9.2f} {rate:>10.0f} {rss:>12.1f}")
+        self.stdout.write(self.style.SUCCESS('Benchmark finished. Peak RSS is the highest value reached so far in the run.'))
+
+    def run_phase(self, results, phase, function):
+        """Run one phase, record its row count, wall time and peak RSS, and return its result."""
+        logger.info(f"Benchmark phase: {phase}")
+        started = time.monotonic()
+        result, rows = function()
+        results.append((phase, rows, time.monotonic() - started, peak_rss_mb()))
+        return result, rows
+
+    def generate(self, export_dir, options):
+        paths, total_rows = generate_exports(export_dir, **options)
+        # bir skips ZIP files modified in the last minute (they may still be uploading)
+        past = time.time() - 120
+        for path in paths:
+            os.utime(path, (past, past))
+        return paths, total_rows
+
+    def ingest(self, paths, total_rows, options):
+        call_command(bir.Command(), **options)
+        left = [path for path in paths if os.path.exists(path)]
+        if left:
+            raise CommandError(f"bir left {len(left)} ZIP file(s) unprocessed, see the log above.")
+        return None, total_rows
+
+    def cleanup(self, prefix):
+        """Delete the benchmark circuits (and their rows) and the ledger entries of the exports."""
+        deleted, _ = Circuit.objects.filter(name__startswith=f"{prefix}-RTR-").delete()
+        IngestArchive.objects.filter(name__startswith=f"{prefix}_").delete()
+        logger.info(f"Benchmark data deleted ({deleted} objects)")
@@ -0,0 +1,111 @@
+# command is: python manage.py benchmark_list --rows 100000
+# Needs Data rows to read: ingest some first, e.g. python manage.py benchmark_bir --keep-data
+
+import time
+import logging
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from apps.iPM.models import Data
+from apps.iPM.serializers import DataSerializer
+from apps.iPM.views.DataView import STREAM_CHUNK_SIZE, UNIT_DIVISORS, format_datetimes, get_label_for_circuit, list_items
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Number of Data rows read by each run
+ROWS = 100000
+
+# Units measured: no conversion, and conversions with rounding
+UNITS = ['bit', 'megabit', 'kilobyte']
+
+
+def serializer_items(queryset, measurement_unit):
+    """
+    The `list` read path before the fast path: model instances through DataSerializer, then
+    the if/elif unit conversion, rounding and label lookup of every row.
+    """
+    def convert_rate(rate, unit):
+        if unit == 'bit':
+            return rate
+        elif unit == 'kilobit':
+            return rate / 1000
+        elif unit == 'megabit':
+            return rate / (10 ** 6)
+        elif unit == 'byte':
+            return rate / 8
+        elif unit == 'kilobyte':
+            return rate / (8 * 10 ** 3)
+        elif unit == 'megabyte':
+            return rate / (8 * 10 ** 6)
+        return rate
+
+    labels = {}
+    rows = queryset.select_related('circuit').iterator(chunk_size=STREAM_CHUNK_SIZE)
+    items = []
+    while True:
+        chunk = list(islice(rows, STREAM_CHUNK_SIZE))
+        if not chunk:
+            return len(items)
+        for item in DataSerializer(chunk, many=True).data:
+            if item['name'] not in labels:
+                labels[item['name']] = get_label_for_circuit(item['name'])
+            items.append({
+                'id': item['id'],
+                'name': labels[item['name']],
+                'inbound_rate': round(convert_rate(item['inbound_rate'], measurement_unit), 3),
+                'outbound_rate': round(convert_rate(item['outbound_rate'], measurement_unit), 3),
+                'time': item['time'],
+            })
+
+
+def column_items(queryset, measurement_unit):
+    """The `list` read path of dataApi: values_list rows, converted and formatted a column at a time."""
+    labels = {}
+    rows = queryset.values_list('id', 'circuit_id', 'time', 'inbound_rate', 'outbound_rate').iterator(chunk_size=STREAM_CHUNK_SIZE)
+    items = []
+    while True:
+        chunk = list(islice(rows, STREAM_CHUNK_SIZE))
+        if not chunk:
+            return len(items)
+        ids, circuit_ids, times, inbound_rates, outbound_rates = zip(*chunk)
+        items.extend(list_items(
+            ids, circuit_ids, format_datetimes(times), inbound_rates, outbound_rates, labels, measurement_unit, integral=True
+        ))
+
+
+class Command(BaseCommand):
+    help = 'Measures the per-row cost of building the dataApi list items, with DataSerializer and with the column fast path.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=ROWS,
+            help=f'Number of Data rows read by each run (default: {ROWS}).'
+        )
+        parser.add_argument(
+            '--units',
+            nargs='+',
+            choices=list(UNIT_DIVISORS),
+            default=UNITS,
+            help=f'Measurement units to measure (default: {" ".join(UNITS)}).'
+        )
+
+    def handle(self, *args, **kwargs):
+        queryset = Data.objects.order_by('time')[:max(1, kwargs['rows'])]
+        count = queryset.count()
+        if not count:
+            raise CommandError('No Data rows to read, ingest some first (benchmark_bir --keep-data).')
+
+        self.stdout.write(f"Database: {connection.vendor}, {count} rows")
+        self.stdout.write(f"{'Unit':<10} {'Path':<11} {'Seconds':>9} {'us/row':>9}")
+        for unit in kwargs['units']:
+            for path, function in (('serializer', serializer_items), ('columns', column_items)):
+                logger.info(f"Benchmark run: {path}, {unit}")
+                started = time.monotonic()
+                rows = function(queryset, unit)
+                seconds = time.monotonic() - started
+                self.stdout.write(f"{unit:<10} {path:<11} {seconds:>9.3f} {seconds / rows * 10 ** 6:>9.1f}")
+        self.stdout.write(self.style.SUCCESS('Benchmark finished. Both paths read the same rows; JSON encoding is not included.'))
@@ -1,16 +1,29 @@
 # command is: python manage.py bir
 
 import os
+import io
+import json
 import time
+import hashlib
+import tempfile
+import functools
 import zipfile
 import csv
 import logging
+import multiprocessing
 import shutil  # Added to enable directory deletion
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 from django.conf import settings
 from django.core.management.base import BaseCommand
-from apps.iPM.models import Data
-from django.db import transaction
+from django.utils import timezone
+from apps.iPM.models import Circuit, Data, IngestArchive, IngestMember
+from apps.iPM.latest import update_latest
+from apps.iPM.rollups import ARCHIVED, RAW, add_to_rollups, compaction_marks, lock_rollups, raw_rows_removed, utc_day
+from apps.iPM.metrics import IngestMetrics, METRICS_FILE, METRICS_LOG, new_archive_stats, new_csv_stats
+from django.db import close_old_connections, connection, connections, transaction
+from django.db.models import F
 
 # Logging configuration
 logging.basicConfig(level=logging.INFO)
@@ -19,33 +32,261 @@ logger = logging.getLogger(__name__)
 # Directory to monitor
 directory_to_watch = '/var/sftp/ipm'
 
+# Number of CSV rows written to the database per transaction
+BATCH_SIZE = 1000
+
+# Columns of the NMS CSV export
+NAME_COLUMN = 'MOEntity'
+INBOUND_COLUMN = 'Inbound Rate(bit/s)'
+OUTBOUND_COLUMN = 'Outbound Rate(bit/s)'
+TIME_COLUMN = 'Time'
+
+# Unique key of Data used by the batch upsert (MySQL finds the key by itself)
+UPSERT_UNIQUE_FIELDS = ['circuit', 'time']
+
+# Rates with more integer digits do not fit Data.inbound_rate/outbound_rate (64-bit integers)
+RATE_MAX_DIGITS = 18
+
+# Folder receiving the rows that could not be parsed, with the reason
+DEAD_LETTER_DIR = '/var/log/bir-dead-letter'
+
+# Watch mode: seconds between scans, seconds a ZIP's size must stay the same before it is
+# considered uploaded, seconds before a failed ZIP is retried and between folder cleanups
+WATCH_INTERVAL = 2
+WATCH_SETTLE = 5
+WATCH_RETRY = 60
+WATCH_PRUNE_INTERVAL = 300
+
 class Command(BaseCommand):
     help = 'Processes zip files, extracts CSV files, and updates the database.'
+    batch_size = BATCH_SIZE
+    stream = False
+    workers = 1
+    directory = directory_to_watch
+    rows_ingested = 0
+    metrics = IngestMetrics(log_path=None, prom_path=None)
+    dead_letter_dir = DEAD_LETTER_DIR
+    csv_stats = None
+    archive_stats = None
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--directory',
+            default=directory_to_watch,
+            help=f'Folder receiving the NMS ZIP files (default: {directory_to_watch}).'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'Number of CSV rows written per transaction (default: {BATCH_SIZE}).'
+        )
+        parser.add_argument(
+            '--stream',
+            action='store_true',
+            help='Read CSV members directly from the ZIP instead of extracting them to disk.'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of worker processes ingesting ZIP files in parallel (default: 1). Workers always use --stream.'
+        )
+        parser.add_argument(
+            '--watch',
+            action='store_true',
+            help='Keep running and ingest new ZIP files as soon as their upload has finished.'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=WATCH_INTERVAL,
+            help=f'Watch mode: seconds between directory scans (default: {WATCH_INTERVAL}).'
+        )
+        parser.add_argument(
+            '--settle',
+            type=float,
+            default=WATCH_SETTLE,
+            help=f'Watch mode: seconds a ZIP file must stay unchanged before it is ingested (default: {WATCH_SETTLE}).'
+        )
+        parser.add_argument(
+            '--dead-letter-dir',
+            default=DEAD_LETTER_DIR,
+            help=f'Folder receiving CSV rows that could not be parsed, with the reason (default: {DEAD_LETTER_DIR}).'
+        )
+        parser.add_argument(
+            '--metrics-log',
+            default=METRICS_LOG,
+            help=f'JSON-lines file receiving one record per CSV and ZIP file (default: {METRICS_LOG}, empty to disable).'
+        )
+        parser.add_argument(
+            '--metrics-file',
+            default=METRICS_FILE,
+            help=f'Prometheus text-format file with ingestion totals and lag (default: {METRICS_FILE}, empty to disable).'
+        )
 
     def handle(self, *args, **kwargs):
+        self.directory = kwargs.get('directory') or directory_to_watch
+        self.batch_size = max(1, kwargs.get('batch_size') or BATCH_SIZE)
+        self.stream = kwargs.get('stream', False)
+        self.workers = max(1, kwargs.get('workers') or 1)
+        if self.workers > 1:
+            # Extracting several ZIP files into the same folder at once could overwrite
+            # each other's CSV files (NMS exports reuse member names), so workers stream
+            self.stream = True
+        self.metrics = IngestMetrics(kwargs.get('metrics_log', METRICS_LOG), kwargs.get('metrics_file', METRICS_FILE))
+        self.dead_letter_dir = kwargs.get('dead_letter_dir') or DEAD_LETTER_DIR
+        # With workers, ZIP files and folder deletions are queued during the scan
+        self.pending_archives = []
+        self.pending_deletions = []
+
+        if kwargs.get('watch'):
+            self.watch(kwargs.get('interval', WATCH_INTERVAL), kwargs.get('settle', WATCH_SETTLE))
+            return
+
         self.stdout.write(self.style.SUCCESS('Starting ZIP file processing...'))
-        # Process directories immediately under directory_to_watch
-        top_level_dirs = [d for d in os.listdir(directory_to_watch) if os.path.isdir(os.path.join(directory_to_watch, d))]
+        self.process_tree()
+
+        if self.workers > 1:
+            self.process_pending_archives()
+            self.delete_pending_directories()
+
+    def process_tree(self, ingest=True):
+        """
+        Walk the watched folder, process ready ZIP files and delete folders without files.
+        With ingest=False only the folder cleanup is done.
+        """
+        # Process directories immediately under the watched folder
+        top_level_dirs = [d for d in os.listdir(self.directory) if os.path.isdir(os.path.join(self.directory, d))]
         dir_files_flags = {}
         if top_level_dirs:
             for dir_name in top_level_dirs:
-                dir_path = os.path.join(directory_to_watch, dir_name)
-                dir_found_files = self.process_directory(dir_path, level=0)
+                dir_path = os.path.join(self.directory, dir_name)
+                dir_found_files = self.process_directory(dir_path, level=0, ingest=ingest)
                 dir_files_flags[dir_path] = dir_found_files
             if len(top_level_dirs) >= 2:
                 for dir_path, has_files in dir_files_flags.items():
                     if not has_files:
-                        logger.info(f"Deleting folder without files: {dir_path}")
-                        shutil.rmtree(dir_path)
+                        self.delete_directory(dir_path, f"Deleting folder without files: {dir_path}")
         else:
-            # No subdirectories, process directory_to_watch directly
-            self.process_directory(directory_to_watch, level=0)
+            # No subdirectories, process the watched folder directly
+            self.process_directory(self.directory, level=0, ingest=ingest)
+
+    def watch(self, interval, settle):
+        """
+        Run as a daemon: scan the watched folder every `interval` seconds and ingest ZIP
+        files as soon as their size has stayed the same for `settle` seconds.
+        Database connections that broke (server restart, failover, wait_timeout) are
+        dropped before every scan and every ZIP file, so the next query reconnects.
+        """
+        self.stdout.write(self.style.SUCCESS(f'Watching {self.directory} for ZIP files...'))
+        watcher = ArchiveWatcher(self.directory, settle)
+        last_prune = time.monotonic()
+        try:
+            while True:
+                close_old_connections()
+                for file_path in watcher.scan():
+                    if self.workers > 1:
+                        self.pending_archives.append(file_path)
+                        continue
+                    close_old_connections()
+                    if self.process_zip(file_path):
+                        logger.info(f"ZIP file processed: {os.path.basename(file_path)}")
+                    else:
+                        logger.error(f"Failed to process ZIP: {os.path.basename(file_path)}")
+                        watcher.retry_later(file_path)
+
+                if self.workers > 1:
+                    for file_path in self.process_pending_archives():
+                        watcher.retry_later(file_path)
+
+                if time.monotonic() - last_prune >= WATCH_PRUNE_INTERVAL:
+                    self.process_tree(ingest=False)
+                    self.delete_pending_directories()
+                    last_prune = time.monotonic()
+
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS('Stopped watching.'))
 
-    def process_directory(self, current_dir, level=0):
+    def delete_pending_directories(self):
+        """
+        Delete the folders queued while workers were running.
+        """
+        # Only touch the directory tree once every worker is done with it
+        for dir_path, message in self.pending_deletions:
+            logger.info(message)
+            shutil.rmtree(dir_path, ignore_errors=True)
+        self.pending_deletions = []
+
+    def process_pending_archives(self):
+        """
+        Ingest the queued ZIP files in a process pool and report throughput per worker.
+        Database connections are closed before forking so that every worker opens its own.
+        Returns the paths of the ZIP files that failed.
+        """
+        if not self.pending_archives:
+            return []
+
+        connections.close_all()
+        failed = []
+        worker_stats = {}
+        started = time.monotonic()
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('fork')) as executor:
+            futures = [
+                executor.submit(
+                    ingest_archive, file_path, self.batch_size, self.stream,
+                    self.metrics.log_path, self.dead_letter_dir
+                )
+                for file_path in self.pending_archives
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                filename = os.path.basename(result['file_path'])
+                if result['success']:
+                    logger.info(f"ZIP file processed: {filename}")
+                else:
+                    logger.error(f"Failed to process ZIP: {filename}")
+                    failed.append(result['file_path'])
+                self.metrics.record_archive(result['metrics'], log=False)
+
+                stats = worker_stats.setdefault(result['worker'], {'archives': 0, 'rows': 0, 'seconds': 0.0})
+                stats['archives'] += 1
+                stats['rows'] += result['rows']
+                stats['seconds'] += result['seconds']
+
+        elapsed = time.monotonic() - started
+        total_rows = sum(stats['rows'] for stats in worker_stats.values())
+        for worker, stats in sorted(worker_stats.items()):
+            rate = stats['rows'] / stats['seconds'] if stats['seconds'] > 0 else 0.0
+            self.stdout.write(
+                f"Worker {worker}: {stats['archives']} ZIP file(s), {stats['rows']} rows "
+                f"in {stats['seconds']:.2f}s, {rate:.0f} rows/s"
+            )
+        rate = total_rows / elapsed if elapsed > 0 else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {len(self.pending_archives)} ZIP file(s) with {self.workers} workers: "
+            f"{total_rows} rows in {elapsed:.2f}s, {rate:.0f} rows/s"
+        ))
+        self.pending_archives = []
+        return failed
+
+    def delete_directory(self, dir_path, message):
+        """
+        Delete a folder without files, or queue it until the workers have finished.
+        """
+        if self.workers > 1:
+            self.pending_deletions.append((dir_path, message))
+            return
+        logger.info(message)
+        shutil.rmtree(dir_path)
+
+    def process_directory(self, current_dir, level=0, ingest=True):
         """
         Process ZIP files in the current directory, and recursively process subdirectories.
         Delete subfolders that don't contain files (zip and/or csv) based on the specified rules.
         Return True if any files (zip or csv) were found in this directory or subdirectories.
+        With ingest=False ZIP files are left alone and only the folder cleanup is done.
         """
         found_files = False
 
@@ -55,10 +296,16 @@ class Command(BaseCommand):
         for filename in files:
             file_path = os.path.join(current_dir, filename)
             found_files = True  # Set to True since we have found a file
+            if not ingest:
+                continue
             if zipfile.is_zipfile(file_path):
                 file_mtime = os.path.getmtime(file_path)
                 # Check if the file was last modified more than 1 minute ago
                 if time.time() - file_mtime > 60:
+                    if self.workers > 1:
+                        self.pending_archives.append(file_path)  # Ingested by the worker pool
+                        continue
+                    close_old_connections()
                     if self.process_zip(file_path):
                         logger.info(f"ZIP file processed: {filename}")
                     else:
@@ -87,7 +334,7 @@ class Command(BaseCommand):
         subdir_files_flags = {}
         for subdir in subdirs:
             subdir_path = os.path.join(current_dir, subdir)
-            subdir_found_files = self.process_directory(subdir_path, level=level+1)
+            subdir_found_files = self.process_directory(subdir_path, level=level+1, ingest=ingest)
             subdir_files_flags[subdir_path] = subdir_found_files
 
         # Update found_files based on subdirectories
@@ -99,14 +346,13 @@ class Command(BaseCommand):
             for subdir_path, has_files in subdir_files_flags.items():
                 if not has_files:
                     # Delete subdirectory if it has no files
-                    logger.info(f"Deleting subfolder without files: {subdir_path}")
-                    shutil.rmtree(subdir_path)
+                    self.delete_directory(subdir_path, f"Deleting subfolder without files: {subdir_path}")
         # else:
         #   Only one subdir exists; do not delete even if it doesn't have files
 
         return found_files
 
-    def process_csv(self, file_path):
+    def process_csv(self, file_path, ledger_member=None):
         """
         Process a CSV file and save its data into the database.
         If the same record (name and time) already exists, update it.
@@ -114,72 +360,362 @@ class Command(BaseCommand):
         try:
             logger.info(f"Processing CSV: {file_path}")
             with open(file_path, newline='') as csvfile:
-                reader = csv.DictReader(csvfile)
-                headers = reader.fieldnames
-                if headers[0].startswith('\ufeff'):
-                    headers[0] = headers[0].replace('\ufeff', '')
-
-                logger.info(f"CSV headers after BOM removal: {headers}")
-
-                for row in reader:
-                    row = {k.strip(): v for k, v in row.items()}
-                    name = row['MOEntity']
-                    inbound_rate = row['Inbound Rate(bit/s)']
-                    outbound_rate = row['Outbound Rate(bit/s)']
-                    time_str = row['Time']
-
-                    # Parse the naive datetime
-                    time_obj = datetime.strptime(time_str, '%m/%d/%Y %H:%M:%S')
-
-                    with transaction.atomic():
-                        data, created = Data.objects.update_or_create(
-                            name=name,
-                            time=time_obj,
-                            defaults={
-                                'inbound_rate': inbound_rate,
-                                'outbound_rate': outbound_rate
-                            }
-                        )
-                        if created:
-                            logger.info(f"New record created: {data}")
-                        else:
-                            logger.info(f"Existing record updated: {data}")
+                self.ingest_csv(csvfile, file_path, ledger_member)
             return True
         except Exception as e:
             logger.error(f"Error processing CSV {file_path}: {e}")
             return False
 
+    def ingest_csv(self, csvfile, source, ledger_member=None):
+        """
+        Read rows from an open CSV text stream and write them to the database.
+        Rows are collected into batches of `batch_size` and each batch is written in
+        a single transaction, so memory use does not depend on the size of the file.
+        With a ledger member, the rows committed by an earlier attempt are skipped and
+        every batch advances the member's checkpoint in the same transaction.
+        Rows that cannot be parsed are written to a dead-letter file before their batch is
+        committed; only database errors, and a dead-letter file that cannot be written,
+        make the file fail (and be retried from the last checkpoint).
+        Row counts and timings are added to `self.csv_stats`, also when an error stops the file.
+        """
+        started = time.monotonic()
+        if self.csv_stats is None:
+            self.start_csv_stats(source)
+        stats = self.csv_stats
+        db_seconds_before = stats['db_seconds']
+        total_rows = 0
+        total_created = 0
+        total_updated = 0
+        total_rejected = 0
+        dead_letter = None
+
+        try:
+            skip_rows = 0
+            if ledger_member is not None:
+                ledger_member.refresh_from_db()
+                skip_rows = ledger_member.rows_committed
+                if skip_rows:
+                    logger.info(
+                        f"Resuming {source} after row {skip_rows} "
+                        f"(batch {ledger_member.batches_committed})"
+                    )
+            offset = 0
+
+            reader = csv.reader(csvfile)
+            headers = next(reader, None)
+            if not headers:
+                logger.warning(f"CSV file has no header row: {source}")
+                return
+            if headers[0].startswith('\ufeff'):
+                headers[0] = headers[0].replace('\ufeff', '')
+            headers = [header.strip() for header in headers]
+
+            logger.info(f"CSV headers after BOM removal: {headers}")
+            dead_letter = DeadLetterFile(self.dead_letter_dir, source, headers)
+            # Circuits deleted since the last CSV must not get rows under their old ids
+            Circuit.objects.forget_deleted()
+
+            # Resolve the column positions once instead of building a dict per row
+            missing_columns = [
+                column for column in (NAME_COLUMN, INBOUND_COLUMN, OUTBOUND_COLUMN, TIME_COLUMN)
+                if column not in headers
+            ]
+            if missing_columns:
+                # Retrying cannot fix the file, so every row goes to the dead-letter file
+                reason = f"missing column(s): {', '.join(missing_columns)}"
+                logger.error(f"CSV file {source} has {reason}")
+                for row in reader:
+                    if row:
+                        offset += 1
+                        dead_letter.write([(offset, row, reason)])
+                total_rejected = offset
+                stats['rows_rejected'] += total_rejected
+                if ledger_member is not None:
+                    IngestMember.objects.filter(pk=ledger_member.pk).update(completed=True)
+                return
+            name_index = headers.index(NAME_COLUMN)
+            inbound_index = headers.index(INBOUND_COLUMN)
+            outbound_index = headers.index(OUTBOUND_COLUMN)
+            time_index = headers.index(TIME_COLUMN)
+            min_length = max(name_index, inbound_index, outbound_index, time_index) + 1
+
+            raw_batch = []
+            raw_rows = []  # (offset, row) of every entry in raw_batch, for the dead-letter file
+            rejected = []
+            for row in reader:
+                if not row:
+                    continue  # Blank line
+                offset += 1
+                if offset <= skip_rows:
+                    continue  # Already committed by a previous attempt
+
+                if len(row) < min_length:
+                    rejected.append((offset, row, 'missing columns'))
+                else:
+                    raw_batch.append((row[name_index], row[time_index], row[inbound_index], row[outbound_index]))
+                    raw_rows.append((offset, row))
+                if len(raw_batch) + len(rejected) >= self.batch_size:
+                    written, created, updated, rejected_count = self.write_raw_batch(
+                        raw_batch, raw_rows, rejected, dead_letter, ledger_member, offset
+                    )
+                    total_rows += written
+                    total_created += created
+                    total_updated += updated
+                    total_rejected += rejected_count
+                    raw_batch, raw_rows, rejected = [], [], []
+
+            if raw_batch or rejected:
+                written, created, updated, rejected_count = self.write_raw_batch(
+                    raw_batch, raw_rows, rejected, dead_letter, ledger_member, offset
+                )
+                total_rows += written
+                total_created += created
+                total_updated += updated
+                total_rejected += rejected_count
+
+            if ledger_member is not None:
+                IngestMember.objects.filter(pk=ledger_member.pk).update(completed=True)
+        finally:
+            if dead_letter is not None:
+                dead_letter.close()
+            elapsed = time.monotonic() - started
+            stats['parse_seconds'] += elapsed - (stats['db_seconds'] - db_seconds_before)
+
+        rate = total_rows / elapsed if elapsed > 0 else float(total_rows)
+        logger.info(
+            f"CSV processed: {source} ({total_rows} rows, {total_created} created, "
+            f"{total_updated} updated, {total_rejected} rejected) in {elapsed:.2f}s, {rate:.0f} rows/s"
+        )
+
+    def write_raw_batch(self, raw_batch, raw_rows, rejected, dead_letter, ledger_member, offset):
+        """
+        Parse and write one batch of raw CSV values. Rows that fail to parse join the
+        already rejected ones and are written to the dead-letter file in the batch
+        transaction (see write_batch). Returns a (written, created, updated, rejected) tuple.
+        """
+        batch, bad_rows = parse_batch(raw_batch) if raw_batch else ([], [])
+        for index, reason in bad_rows:
+            rejected.append((*raw_rows[index], reason))
+        bad_indexes = {index for index, _ in bad_rows}
+        batch_rows = [raw_row for index, raw_row in enumerate(raw_rows) if index not in bad_indexes]
+        rejected_before = len(rejected)
+        created, updated = self.write_batch(batch, ledger_member, offset, batch_rows, rejected, dead_letter)
+        written = len(batch) - (len(rejected) - rejected_before)
+        if rejected:
+            self.csv_stats['rows_rejected'] += len(rejected)
+            logger.warning(f"{len(rejected)} row(s) rejected in {dead_letter.source}, see {dead_letter.path}")
+        return written, created, updated, len(rejected)
+
+    def write_batch(self, batch, ledger_member=None, offset=None, raw_rows=None, rejected=None, dead_letter=None):
+        """
+        Write a batch of (name, time, inbound_rate, outbound_rate) rows in one transaction.
+        Circuit names are interned into Circuit ids first, then existing records are looked
+        up with a single query on the unique (circuit, time) index to count inserts and
+        updates, and all rows are written with one bulk upsert. The rows are added to the
+        rollup buckets holding them (locked first, so that batches sharing buckets run one
+        after the other) and the newest sample of each circuit is recorded, and when a
+        ledger member is given, its row offset is moved to `offset`, all in the same
+        transaction.
+        Rows whose circuit name cannot be registered are not written, nor the samples of days
+        folded into rollups by `compact_data` or moved to the cold archive by `archive_data`
+        (the marks are read again once the rollups are locked, so a day compacted or archived
+        while the batch waited is seen): with `raw_rows`, the (offset, row) of each batch entry,
+        they are added to `rejected`. With a dead-letter
+        file, the `rejected` rows are written to it before the commit, so a file that cannot
+        be written leaves the checkpoint where it was; a commit failing afterwards only
+        repeats them on the retry.
+        Returns a (created, updated) tuple.
+        """
+        started = time.monotonic()
+
+        # Registered outside the batch transaction so the id cache never sees a rollback
+        circuit_ids = Circuit.objects.intern(name for name, _, _, _ in batch)
+
+        # Keep the last occurrence of a (circuit, time) pair, like sequential upserts would
+        rows = {}
+        indexes = {}
+        for index, (name, time_obj, inbound_rate, outbound_rate) in enumerate(batch):
+            if name not in circuit_ids:
+                self.reject(raw_rows, rejected, [index], f"circuit '{name}' could not be registered")
+                continue
+            key = (circuit_ids[name], time_obj)
+            rows[key] = (inbound_rate, outbound_rate)
+            indexes.setdefault(key, []).append(index)
+        # Not locking the rollups of days already known to be gone
+        self.drop_removed_days(rows, indexes, raw_rows, rejected)
+
+        with transaction.atomic():
+            locked_rollups = lock_rollups(rows)
+            self.drop_removed_days(rows, indexes, raw_rows, rejected)
+            written = sum(len(key_indexes) for key_indexes in indexes.values())
+            times = {time_obj for _, time_obj in rows}
+            data_queryset = Data.objects.filter(circuit_id__in=set(circuit_ids.values()), time__in=times)
+            existing = {
+                (circuit_id, time_obj): (inbound_rate, outbound_rate)
+                for circuit_id, time_obj, inbound_rate, outbound_rate
+                in data_queryset.values_list('circuit_id', 'time', 'inbound_rate', 'outbound_rate')
+                if (circuit_id, time_obj) in rows
+            }
+
+            to_update = []
+            to_create = []
+            for key, (inbound_rate, outbound_rate) in rows.items():
+                data = Data(circuit_id=key[0], time=key[1], inbound_rate=inbound_rate, outbound_rate=outbound_rate)
+                if key in existing:
+                    to_update.append(data)
+                else:
+                    to_create.append(data)
+
+            # One upsert on the unique (circuit, time) constraint writes both kinds of rows,
+            # and a row inserted meanwhile by another worker is updated instead of failing
+            Data.objects.bulk_create(
+                to_create + to_update,
+                batch_size=self.batch_size,
+                update_conflicts=True,
+                unique_fields=UPSERT_UNIQUE_FIELDS if connection.features.supports_update_conflicts_with_target else None,
+                update_fields=['inbound_rate', 'outbound_rate']
+            )
+            add_to_rollups(rows, existing, locked_rollups)
+            update_latest(rows)
+            if ledger_member is not None:
+                IngestMember.objects.filter(pk=ledger_member.pk).update(
+                    rows_committed=offset,
+                    batches_committed=F('batches_committed') + 1
+                )
+            if rejected and dead_letter is not None:
+                rejected.sort(key=lambda item: item[0])
+                dead_letter.write(rejected)
+
+        elapsed = time.monotonic() - started
+        self.rows_ingested += written
+        stats = self.csv_stats
+        stats['rows_parsed'] += written
+        stats['rows_inserted'] += len(to_create)
+        stats['rows_updated'] += len(to_update)
+        stats['db_seconds'] += elapsed
+        if times:
+            newest = max(times)
+            if stats['newest_sample'] is None or newest > stats['newest_sample']:
+                stats['newest_sample'] = newest
+
+        logger.info(
+            f"Batch written: {written} rows ({len(to_create)} created, {len(to_update)} updated) "
+            f"in {elapsed:.2f}s"
+        )
+        return len(to_create), len(to_update)
+
+    def drop_removed_days(self, rows, indexes, raw_rows, rejected):
+        """
+        Drop the write_batch rows of days folded into rollups by `compact_data` or moved to
+        the cold archive by `archive_data`, their samples cannot be added any more.
+        """
+        marks = compaction_marks({utc_day(time_obj) for _, time_obj in rows})
+        if marks.get(RAW) or marks[ARCHIVED]:
+            for key in [key for key in rows if raw_rows_removed(key[1], marks)]:
+                del rows[key]
+                self.reject(raw_rows, rejected, indexes.pop(key), 'day already compacted or archived')
+
+    def reject(self, raw_rows, rejected, indexes, reason):
+        """Add the raw rows of the given batch entries to `rejected`, when write_batch was given them."""
+        if raw_rows is not None and rejected is not None:
+            for index in indexes:
+                rejected.append((*raw_rows[index], reason))
+
     def process_zip(self, file_path):
+        """
+        Process a ZIP file by extracting or streaming its CSV files, and record its metrics.
+        ZIP files already fully ingested according to the ledger are deleted unprocessed.
+        """
+        started = time.monotonic()
+        self.archive_stats = new_archive_stats(file_path)
+        success = False
+        try:
+            archive = self.get_ledger_archive(file_path)
+            if archive is None:
+                self.archive_stats['status'] = 'duplicate'
+                success = True
+            elif self.stream:
+                success = self.process_zip_stream(file_path, archive)
+            else:
+                success = self.process_zip_extract(file_path, archive)
+        except Exception as e:
+            logger.error(f"Error processing ZIP file {file_path}: {e}")
+
+        stats = self.archive_stats
+        if success and stats['status'] != 'duplicate':
+            stats['status'] = 'partial' if stats['csv_failed'] else 'processed'
+        stats['seconds'] = time.monotonic() - started
+        self.metrics.record_archive(stats)
+        return success
+
+    def start_csv_stats(self, source):
+        self.csv_stats = new_csv_stats(source)
+
+    def record_csv_stats(self, success, retries):
+        """
+        Log the metrics of a CSV file once its retries are over and add them to its ZIP file.
+        """
+        stats = self.csv_stats
+        stats['status'] = 'processed' if success else 'failed'
+        stats['retries'] = retries
+        self.metrics.record_csv(stats)
+
+        archive_stats = self.archive_stats
+        archive_stats['csv_files'] += 1
+        if not success:
+            archive_stats['csv_failed'] += 1
+        for field in ('rows_parsed', 'rows_inserted', 'rows_updated', 'rows_rejected', 'parse_seconds', 'db_seconds', 'retries'):
+            archive_stats[field] += stats[field]
+        newest = stats['newest_sample']
+        if newest is not None and (archive_stats['newest_sample'] is None or newest > archive_stats['newest_sample']):
+            archive_stats['newest_sample'] = newest
+
+    def process_zip_extract(self, file_path, archive):
         """
         Extract a ZIP file, process all CSV files inside, and delete the ZIP.
+        A CSV that still fails after all retries is re-zipped into '<member>.zip', which
+        resumes from its checkpoint on the next run (see rezip_comment).
         """
         try:
             logger.info(f"Extracting ZIP file: {file_path}")
             with zipfile.ZipFile(file_path, 'r') as zip_ref:
                 zip_ref.extractall(os.path.dirname(file_path))  # Extract all files in the current directory
                 extracted_files = zip_ref.namelist()
+                origin = rezip_origin(zip_ref)
             os.remove(file_path)  # Delete ZIP after extraction
             logger.info(f"ZIP file deleted: {file_path}")
 
             # After extraction, process the extracted CSV files
+            all_completed = True
             for extracted_file in extracted_files:
                 extracted_file_path = os.path.join(os.path.dirname(file_path), extracted_file)
                 if os.path.isfile(extracted_file_path) and extracted_file.endswith('.csv'):
-                    # Process the CSV file
+                    ledger_member = get_ledger_member(archive, extracted_file, origin)
+                    if ledger_member.completed:
+                        os.remove(extracted_file_path)
+                        logger.info(f"CSV file already ingested, deleted: {extracted_file}")
+                        continue
+
+                    # Process the CSV file, resuming from the last committed batch on retries
                     retry_count = 0  # Initialize retry counter
                     max_retries = 10  # Maximum number of retries
+                    self.start_csv_stats(extracted_file_path)
 
                     while retry_count < max_retries:
-                        if self.process_csv(extracted_file_path):
+                        if self.process_csv(extracted_file_path, ledger_member):
                             os.remove(extracted_file_path)  # Delete CSV after successful processing
                             logger.info(f"CSV file successfully processed and deleted: {extracted_file}")
+                            complete_original_archive(ledger_member, archive)
                             break  # Exit the loop once the CSV is processed successfully
                         else:
                             retry_count += 1
                             logger.error(f"Failed to process CSV: {extracted_file}. Retrying ({retry_count}/{max_retries})...")
                             time.sleep(10)  # Sleep for 10 seconds before retrying
+                            close_old_connections()  # Reconnect if the failure broke the connection
 
+                    self.record_csv_stats(retry_count < max_retries, retry_count)
                     if retry_count >= max_retries:
+                        all_completed = False
                         logger.error(f"CSV processing failed after {max_retries} attempts: {extracted_file}")
 
                         # Re-zip the CSV file
@@ -191,6 +727,7 @@ class Command(BaseCommand):
                             # Create a new ZIP file containing the failed CSV file
                             with zipfile.ZipFile(zip_file_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
                                 zipf.write(extracted_file_path, arcname=extracted_file)  # Use original file name inside ZIP
+                                zipf.comment = rezip_comment(ledger_member)
 
                             # Delete the CSV file after zipping
                             os.remove(extracted_file_path)
@@ -199,7 +736,435 @@ class Command(BaseCommand):
                             logger.error(f"Failed to re-zip CSV file: {extracted_file_path}. Error: {e}")
                             # Optionally, you can decide whether to keep or remove the CSV in case of failure
 
+            if all_completed:
+                IngestArchive.objects.filter(pk=archive.pk).update(completed=True)
             return True
         except Exception as e:
             logger.error(f"Error processing ZIP file {file_path}: {e}")
-            return False
\ No newline at end of file
+            return False
+
+    def process_zip_stream(self, file_path, archive):
+        """
+        Process all CSV files inside a ZIP without extracting them to disk.
+        Each CSV member is decoded incrementally from the archive and handed to the
+        database writer batch by batch. A member that still fails after all retries is
+        copied into its own '<member>.zip' next to the archive, so it is picked up again
+        on the next run, and the original ZIP is deleted. The copies are written under
+        temporary names and moved into place once the original ZIP is closed and deleted:
+        a failed '<member>.zip' is itself the archive being read. If a copy cannot be
+        written, the original ZIP is kept instead. The ZIP comment of a copy names the
+        original archive and member (see rezip_comment), so it resumes from its checkpoint.
+        """
+        rezipped = []  # (temporary path, final path) of the failed members' ZIP files
+        try:
+            logger.info(f"Streaming ZIP file: {file_path}")
+            directory = os.path.dirname(file_path)
+            all_completed = True
+            keep_archive = False
+            with zipfile.ZipFile(file_path, 'r') as zip_ref:
+                origin = rezip_origin(zip_ref)
+                for member in zip_ref.infolist():
+                    if member.is_dir() or not member.filename.endswith('.csv'):
+                        continue
+
+                    ledger_member = get_ledger_member(archive, member.filename, origin)
+                    if ledger_member.completed:
+                        logger.info(f"CSV member already ingested: {member.filename}")
+                        continue
+
+                    retry_count = 0  # Initialize retry counter
+                    max_retries = 10  # Maximum number of retries
+                    self.start_csv_stats(f"{file_path}:{member.filename}")
+
+                    while retry_count < max_retries:
+                        if self.process_csv_member(zip_ref, member, file_path, ledger_member):
+                            logger.info(f"CSV member successfully processed: {member.filename}")
+                            complete_original_archive(ledger_member, archive)
+                            break
+                        else:
+                            retry_count += 1
+                            logger.error(f"Failed to process CSV: {member.filename}. Retrying ({retry_count}/{max_retries})...")
+                            time.sleep(10)  # Sleep for 10 seconds before retrying
+                            close_old_connections()  # Reconnect if the failure broke the connection
+
+                    self.record_csv_stats(retry_count < max_retries, retry_count)
+                    if retry_count >= max_retries:
+                        all_completed = False
+                        logger.error(f"CSV processing failed after {max_retries} attempts: {member.filename}")
+
+                        # Copy the failed member into its own ZIP without going through a CSV on disk
+                        member_name = os.path.basename(member.filename)
+                        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.bir-', suffix='.zip.tmp')
+                        try:
+                            with os.fdopen(fd, 'wb') as tmp_file, zipfile.ZipFile(tmp_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
+                                with zip_ref.open(member) as source, zipf.open(member_name, 'w') as target:
+                                    shutil.copyfileobj(source, target)
+                                zipf.comment = rezip_comment(ledger_member)
+                            rezipped.append((tmp_path, os.path.join(directory, member_name + '.zip')))
+                        except Exception as e:
+                            logger.error(f"Failed to re-zip CSV member: {member.filename}. Error: {e}")
+                            os.remove(tmp_path)
+                            keep_archive = True
+
+            if all_completed:
+                IngestArchive.objects.filter(pk=archive.pk).update(completed=True)
+            if keep_archive:
+                logger.error(f"ZIP file kept to retry its failed CSV members: {file_path}")
+            else:
+                os.remove(file_path)  # Delete ZIP after all members were handled
+                logger.info(f"ZIP file deleted: {file_path}")
+            for tmp_path, zip_file_path in rezipped:
+                if keep_archive:
+                    os.remove(tmp_path)
+                else:
+                    os.replace(tmp_path, zip_file_path)
+                    logger.info(f"Failed CSV member re-zipped: {zip_file_path}")
+            return True
+        except Exception as e:
+            logger.error(f"Error processing ZIP file {file_path}: {e}")
+            # The ZIP is processed again, copies left behind would be ingested twice
+            for tmp_path, _ in rezipped:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            return False
+
+    def process_csv_member(self, zip_ref, member, zip_path, ledger_member=None):
+        """
+        Process one CSV member of an open ZIP file as a stream.
+        The 'utf-8-sig' codec drops a leading BOM while decoding incrementally.
+        """
+        source = f"{zip_path}:{member.filename}"
+        try:
+            logger.info(f"Processing CSV: {source}")
+            with zip_ref.open(member) as raw:
+                with io.TextIOWrapper(raw, encoding='utf-8-sig', newline='') as csvfile:
+                    self.ingest_csv(csvfile, source, ledger_member)
+            return True
+        except Exception as e:
+            logger.error(f"Error processing CSV {source}: {e}")
+            return False
+
+    def get_ledger_archive(self, file_path):
+        """
+        Look up a ZIP file in the ingest ledger by the SHA-256 of its content.
+        Returns the ledger entry to record progress in, or None if the same content was
+        already fully ingested, in which case the duplicate ZIP is deleted.
+        """
+        sha256 = file_sha256(file_path)
+        archive, created = IngestArchive.objects.get_or_create(
+            sha256=sha256,
+            defaults={
+                'name': os.path.basename(file_path),
+                'size': os.path.getsize(file_path)
+            }
+        )
+        if archive.completed:
+            os.remove(file_path)
+            logger.info(f"Duplicate ZIP file already ingested as {archive.name}, deleted: {file_path}")
+            return None
+        if not created:
+            logger.info(f"Resuming ZIP file previously seen as {archive.name}: {file_path}")
+        return archive
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_nms_time(value):
+    """
+    Parse a 'MM/DD/YYYY HH:MM:SS' timestamp of the NMS export into an aware datetime in the
+    default timezone. A file only holds a few distinct timestamps (one per polling
+    interval), so results are memoized.
+    """
+    try:
+        date_part, time_part = value.split(' ')
+        month, day, year = date_part.split('/')
+        hour, minute, second = time_part.split(':')
+        if len(year) != 4:
+            raise ValueError(value)
+        parsed = datetime(int(year), int(month), int(day), int(hour), int(minute), int(second))
+    except ValueError:
+        # Anything unusual goes through strptime, which also raises the usual error
+        parsed = datetime.strptime(value, '%m/%d/%Y %H:%M:%S')
+    return timezone.make_aware(parsed)
+
+
+def parse_rate(value, column=INBOUND_COLUMN):
+    """
+    Parse a rate value in bit/s, rejecting values that Data cannot store.
+    Data keeps whole bit/s, so fractions are rounded to the nearest integer, halves away
+    from zero like SQL ROUND() in `convert_rates`.
+    """
+    try:
+        rate = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"invalid {column} '{value}'")
+    if not rate.is_finite() or (rate and rate.adjusted() >= RATE_MAX_DIGITS):
+        raise ValueError(f"invalid {column} '{value}'")
+    return int(rate.to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def parse_row(name, time_str, inbound_rate, outbound_rate):
+    """
+    Parse one row of raw CSV values, raising a ValueError that names the bad column.
+    """
+    if not name.strip():
+        raise ValueError(f"missing {NAME_COLUMN}")
+    try:
+        time_obj = parse_nms_time(time_str)
+    except ValueError:
+        raise ValueError(f"invalid {TIME_COLUMN} '{time_str}'")
+    return (
+        name,
+        time_obj,
+        parse_rate(inbound_rate, INBOUND_COLUMN),
+        parse_rate(outbound_rate, OUTBOUND_COLUMN)
+    )
+
+
+def parse_batch(raw_batch):
+    """
+    Parse a batch of raw (name, time, inbound rate, outbound rate) CSV values column by
+    column into rows for Command.write_batch. If any value is bad, the batch is parsed
+    again row by row to find the culprits. Returns the parsed rows and a list of
+    (index in raw_batch, reason) for the rows that were rejected.
+    """
+    names, times, inbound_rates, outbound_rates = zip(*raw_batch)
+    try:
+        if not all(name.strip() for name in names):
+            raise ValueError(f"missing {NAME_COLUMN}")
+        rows = list(zip(
+            names,
+            map(parse_nms_time, times),
+            map(parse_rate, inbound_rates),
+            map(parse_rate, outbound_rates)
+        ))
+        return rows, []
+    except ValueError:
+        pass
+
+    rows = []
+    rejected = []
+    for index, values in enumerate(raw_batch):
+        try:
+            rows.append(parse_row(*values))
+        except ValueError as e:
+            rejected.append((index, str(e)))
+    return rows, rejected
+
+
+class DeadLetterFile:
+    """
+    CSV file collecting the rejected rows of one source file, created on first write.
+    Each line holds the source, the row number (header excluded), the reason and the
+    original values, so the rows can be fixed and fed back into `bir`.
+    """
+
+    def __init__(self, directory, source, headers):
+        self.directory = directory
+        self.source = source
+        self.headers = headers
+        name = source.replace(':', '-').strip(os.sep).replace(os.sep, '_')
+        self.path = os.path.join(directory, f"{timezone.now():%Y%m%d}-{name}.rejected.csv")
+        self.file = None
+        self.writer = None
+
+    def write(self, rejected):
+        if self.file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            new_file = not os.path.exists(self.path)
+            self.file = open(self.path, 'a', newline='')
+            self.writer = csv.writer(self.file)
+            if new_file:
+                self.writer.writerow(['Source', 'Row', 'Error'] + self.headers)
+        for offset, row, reason in rejected:
+            self.writer.writerow([self.source, offset, reason] + row)
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """
+    Return the hex SHA-256 digest of a file, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def rezip_comment(ledger_member):
+    """
+    Return the ZIP comment of a failed CSV copied into its own ZIP: the SHA-256 of the
+    original archive and the member name, whose ledger entry holds the rows committed.
+    """
+    return json.dumps({'archive': ledger_member.archive.sha256, 'member': ledger_member.name}).encode()
+
+
+def rezip_origin(zip_ref):
+    """
+    Return the (archive SHA-256, member name) recorded by rezip_comment in an open ZIP file,
+    or None for any other ZIP file.
+    """
+    try:
+        origin = json.loads(zip_ref.comment.decode())
+        return origin['archive'], origin['member']
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+def get_ledger_member(archive, name, origin=None):
+    """
+    Return the ledger entry of a CSV member of an archive. The member of a re-zipped failed
+    CSV continues the entry of the original archive, so it resumes from its checkpoint (the
+    copy has the same rows), unless that entry no longer exists.
+    """
+    if origin is not None and os.path.basename(origin[1]) == name:
+        ledger_member = IngestMember.objects.filter(archive__sha256=origin[0], name=origin[1]).select_related('archive').first()
+        if ledger_member is not None:
+            return ledger_member
+    ledger_member, _ = IngestMember.objects.get_or_create(archive=archive, name=name)
+    return ledger_member
+
+
+def complete_original_archive(ledger_member, archive):
+    """
+    Mark the original archive of a re-zipped member completed once all its members are.
+    """
+    if ledger_member.archive_id == archive.pk:
+        return
+    if not IngestMember.objects.filter(archive_id=ledger_member.archive_id, completed=False).exists():
+        IngestArchive.objects.filter(pk=ledger_member.archive_id).update(completed=True)
+        logger.info(f"Ingest of {ledger_member.archive.name} completed by its re-zipped members")
+
+
+class ArchiveWatcher:
+    """
+    Incremental scanner used by `bir --watch`.
+    Keeps the size and mtime of every file between scans and reports a ZIP file as ready
+    once both have stayed the same for `settle` seconds. Folders whose mtime has not changed
+    are not listed again; only the files already known in them are stat'ed.
+    """
+
+    def __init__(self, root, settle):
+        self.root = root
+        self.settle = settle
+        self.files = {}        # path -> [size, mtime_ns, unchanged since, state]
+        self.directories = {}  # path -> (mtime_ns, file paths, subfolder paths)
+        self.retry_at = {}     # path -> monotonic time after which a failed ZIP is retried
+
+    def scan(self):
+        """
+        Scan the tree once and return the ZIP files that are ready to be ingested.
+        """
+        now = time.monotonic()
+        ready = []
+        seen_dirs = set()
+        self.scan_directory(self.root, now, ready, seen_dirs)
+
+        # Forget folders that disappeared, together with their files
+        for dir_path in list(self.directories):
+            if dir_path not in seen_dirs:
+                for file_path in self.directories.pop(dir_path)[1]:
+                    self.files.pop(file_path, None)
+                    self.retry_at.pop(file_path, None)
+        return ready
+
+    def scan_directory(self, dir_path, now, ready, seen_dirs):
+        try:
+            dir_mtime = os.stat(dir_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        seen_dirs.add(dir_path)
+
+        cached = self.directories.get(dir_path)
+        if cached and cached[0] == dir_mtime:
+            file_paths, subdirs = cached[1], cached[2]
+            # Nothing was added or removed here, so the known files are only stat'ed
+            for file_path in file_paths:
+                state = self.files.get(file_path)
+                if state is None or state[3] == 'queued':
+                    continue
+                try:
+                    stat = os.stat(file_path)
+                except FileNotFoundError:
+                    continue
+                self.check_file(file_path, stat, now, ready)
+        else:
+            file_paths = []
+            subdirs = []
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        file_paths.append(entry.path)
+                        try:
+                            self.check_file(entry.path, entry.stat(), now, ready)
+                        except FileNotFoundError:
+                            continue
+
+            # Drop files that were removed since the previous listing
+            if cached:
+                for file_path in set(cached[1]) - set(file_paths):
+                    self.files.pop(file_path, None)
+                    self.retry_at.pop(file_path, None)
+            self.directories[dir_path] = (dir_mtime, file_paths, subdirs)
+
+        for subdir in subdirs:
+            self.scan_directory(subdir, now, ready, seen_dirs)
+
+    def check_file(self, file_path, stat, now, ready):
+        state = self.files.get(file_path)
+        if state is None or state[0] != stat.st_size or state[1] != stat.st_mtime_ns:
+            # New or still growing file
+            self.files[file_path] = [stat.st_size, stat.st_mtime_ns, now, 'pending']
+            return
+
+        if state[3] == 'failed':
+            if now < self.retry_at.get(file_path, 0):
+                return
+            state[3] = 'pending'
+
+        if state[3] == 'pending' and now - state[2] >= self.settle:
+            if zipfile.is_zipfile(file_path):
+                state[3] = 'queued'
+                ready.append(file_path)
+            else:
+                state[3] = 'done'  # Not a ZIP, ignored until it changes
+
+    def retry_later(self, file_path):
+        """
+        Mark a ZIP file that failed to process so it is retried after WATCH_RETRY seconds.
+        """
+        state = self.files.get(file_path)
+        if state is not None:
+            state[3] = 'failed'
+            self.retry_at[file_path] = time.monotonic() + WATCH_RETRY
+
+
+def ingest_archive(file_path, batch_size, stream, metrics_log=None, dead_letter_dir=DEAD_LETTER_DIR):
+    """
+    Worker entry point for `bir --workers`: ingest one ZIP file in the current process.
+    Returns a summary used by the parent to report throughput per worker and to update
+    the metrics file; the JSON-lines records are written by the worker itself.
+    """
+    command = Command()
+    command.batch_size = batch_size
+    command.stream = stream
+    command.metrics = IngestMetrics(log_path=metrics_log, prom_path=None)
+    command.dead_letter_dir = dead_letter_dir
+    started = time.monotonic()
+    close_old_connections()  # A pool process ingests several ZIP files on one connection
+    success = command.process_zip(file_path)
+    return {
+        'file_path': file_path,
+        'success': success,
+        'rows': command.rows_ingested,
+        'seconds': time.monotonic() - started,
+        'worker': os.getpid(),
+        'metrics': command.archive_stats,
+    }
@@ -0,0 +1,38 @@
+# command is: python manage.py build_latest
+
+import logging
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from apps.iPM.latest import refresh_latest
+from apps.iPM.models import Circuit
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Number of circuits refreshed per transaction
+CHUNK_SIZE = 500
+
+class Command(BaseCommand):
+    help = 'Builds the newest-sample snapshot (CircuitLatest) of every circuit from the Data rows written before it existed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help=f'Number of circuits refreshed per transaction (default: {CHUNK_SIZE}).'
+        )
+
+    def handle(self, *args, **kwargs):
+        chunk_size = max(1, kwargs.get('chunk_size') or CHUNK_SIZE)
+        circuit_ids = list(Circuit.objects.order_by('id').values_list('id', flat=True))
+        # Each circuit is a single lookup on the unique (circuit, time) index. Run it with
+        # `bir` stopped: a batch committed meanwhile could be overwritten by an older sample
+        for start in range(0, len(circuit_ids), chunk_size):
+            chunk = circuit_ids[start:start + chunk_size]
+            with transaction.atomic():
+                refresh_latest(chunk)
+            logger.info(f"Refreshed {start + len(chunk)} of {len(circuit_ids)} circuits")
+
+        self.stdout.write(self.style.SUCCESS(f'Newest samples of {len(circuit_ids)} circuits recorded.'))
@@ -0,0 +1,59 @@
+# command is: python manage.py build_rollups
+
+import logging
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+from apps.iPM.models import Data
+from apps.iPM.rollups import update_rollups
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Number of Data ids read per transaction
+CHUNK_SIZE = 10000
+
+class Command(BaseCommand):
+    help = 'Builds the 5-minute, hourly and daily rollups of the Data rows written before rollups existed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help=f'Number of Data ids read per transaction (default: {CHUNK_SIZE}).'
+        )
+        parser.add_argument(
+            '--start-id',
+            type=int,
+            default=None,
+            help='First Data id to read, to continue a stopped run (see the last logged id).'
+        )
+
+    def handle(self, *args, **kwargs):
+        chunk_size = max(1, kwargs.get('chunk_size') or CHUNK_SIZE)
+        bounds = Data.objects.filter(circuit__isnull=False).aggregate(first=Min('id'), last=Max('id'))
+        if bounds['first'] is None:
+            self.stdout.write(self.style.SUCCESS('No Data rows to roll up.'))
+            return
+        first = max(bounds['first'], kwargs.get('start_id') or bounds['first'])
+
+        self.stdout.write(self.style.SUCCESS(f"Building rollups for Data ids {first} to {bounds['last']}..."))
+        total = 0
+        # Recomputing a bucket always starts from the raw rows, so buckets shared by two
+        # chunks end up with the right values; a concurrent `bir` batch adding samples to
+        # the same buckets waits for the chunk (or the chunk for it) on their daily rows
+        for start in range(first, bounds['last'] + 1, chunk_size):
+            keys = set(
+                Data.objects.filter(id__gte=start, id__lt=start + chunk_size, circuit__isnull=False)
+                .values_list('circuit_id', 'time')
+            )
+            if not keys:
+                continue
+            with transaction.atomic():
+                update_rollups(keys)
+            total += len(keys)
+            logger.info(f"Rolled up {total} rows so far (up to id {start + chunk_size - 1})")
+
+        self.stdout.write(self.style.SUCCESS(f'{total} Data rows rolled up.'))
@@ -0,0 +1,113 @@
+# command is: python manage.py compact_data --raw-days 30 --five-minute-days 90 --hour-days 365
+
+import logging
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+from apps.iPM.models import Circuit, Data
+from apps.iPM.rollups import RAW, ROLLUPS, bucket_start, set_compaction_mark, update_rollups
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Default retention policy in days: raw samples, 5-minute and hourly rollups (daily ones are kept forever)
+RAW_DAYS = 30
+FIVE_MINUTE_DAYS = 90
+HOUR_DAYS = 365
+
+# Number of circuits folded per transaction, and of rollup rows deleted per transaction
+CHUNK_SIZE = 100
+DELETE_SIZE = 10000
+
+class Command(BaseCommand):
+    help = (
+        'Applies the retention policy: raw Data rows older than --raw-days are folded into the rollups '
+        'and deleted, then 5-minute and hourly rollups past their retention are deleted. Daily rollups are '
+        'kept forever. Work is done in small transactions and a stopped run continues where it stopped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--raw-days', type=int, default=RAW_DAYS, help=f'Days of raw samples to keep (default: {RAW_DAYS}).')
+        parser.add_argument(
+            '--five-minute-days',
+            type=int,
+            default=FIVE_MINUTE_DAYS,
+            help=f'Days of 5-minute rollups to keep (default: {FIVE_MINUTE_DAYS}).'
+        )
+        parser.add_argument('--hour-days', type=int, default=HOUR_DAYS, help=f'Days of hourly rollups to keep (default: {HOUR_DAYS}).')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help=f'Number of circuits folded per transaction (default: {CHUNK_SIZE}).'
+        )
+
+    def handle(self, *args, **kwargs):
+        raw_days = kwargs['raw_days']
+        five_minute_days = kwargs['five_minute_days']
+        hour_days = kwargs['hour_days']
+        # Each level is computed from the finer one, so a finer level cannot outlive a coarser one
+        if not 1 <= raw_days <= five_minute_days <= hour_days:
+            raise CommandError('Retention days must be positive and grow from raw to 5-minute to hourly.')
+        if Data.objects.filter(circuit__isnull=True).exists():
+            raise CommandError('Some Data rows are not linked to a circuit yet, run `python manage.py intern_circuits` first.')
+
+        # Retention periods end at UTC midnight, so whole rollup buckets are compacted
+        today = bucket_start(timezone.now(), 86400)
+        self.compact_raw(today - timedelta(days=raw_days), max(1, kwargs.get('chunk_size') or CHUNK_SIZE))
+        for (level, _, model), days in zip(ROLLUPS, (five_minute_days, hour_days)):
+            self.delete_rollups(level, model, today - timedelta(days=days))
+        self.stdout.write(self.style.SUCCESS('Retention policy applied.'))
+
+    def compact_raw(self, cutoff, chunk_size):
+        """
+        Fold the raw rows older than `cutoff` into the rollups and delete them, one UTC day
+        and one chunk of circuits per transaction. The raw compaction mark moves forward after
+        each day, from then on `bir` rejects samples of that day and rollups are left as they are.
+        """
+        first = Data.objects.filter(time__lt=cutoff).aggregate(first=Min('time'))['first']
+        if first is None:
+            set_compaction_mark(RAW, cutoff)
+            self.stdout.write(f'No raw samples older than {cutoff:%Y-%m-%d} to compact.')
+            return
+
+        circuit_ids = list(Circuit.objects.order_by('id').values_list('id', flat=True))
+        day = bucket_start(first, 86400)
+        total = 0
+        while day < cutoff:
+            day_end = day + timedelta(days=1)
+            for start in range(0, len(circuit_ids), chunk_size):
+                rows = Data.objects.filter(
+                    circuit_id__in=circuit_ids[start:start + chunk_size],
+                    time__gte=day,
+                    time__lt=day_end
+                )
+                with transaction.atomic():
+                    keys = set(rows.values_list('circuit_id', 'time'))
+                    if not keys:
+                        continue
+                    # Recompute the buckets from the raw rows one last time, then drop the rows
+                    update_rollups(keys)
+                    rows.delete()
+                total += len(keys)
+            set_compaction_mark(RAW, day_end)
+            logger.info(f"Compacted raw samples of {day:%Y-%m-%d} ({total} rows so far)")
+            day = day_end
+        self.stdout.write(f'{total} raw samples older than {cutoff:%Y-%m-%d} folded into rollups and deleted.')
+
+    def delete_rollups(self, level, model, cutoff):
+        """Delete the rollups of one level older than `cutoff`, in chunks."""
+        total = 0
+        expired = model.objects.filter(bucket__lt=cutoff)
+        while True:
+            with transaction.atomic():
+                ids = list(expired.values_list('id', flat=True)[:DELETE_SIZE])
+                if not ids:
+                    break
+                model.objects.filter(id__in=ids).delete()
+            total += len(ids)
+        set_compaction_mark(level, cutoff)
+        self.stdout.write(f'{total} {level} rollups older than {cutoff:%Y-%m-%d} deleted.')
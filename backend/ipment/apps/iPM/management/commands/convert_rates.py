@@ -0,0 +1,113 @@
+# command is: python manage.py convert_rates
+# Run with `bir` stopped, after deploying the integer rate columns and before the migration
+# turning Data.inbound_rate/outbound_rate and the rollup aggregates into BigIntegerField.
+
+import logging
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Max, Min
+from apps.iPM.models import Data, DataRollup5m, DataRollupHour, DataRollupDay
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Number of ids converted per UPDATE statement
+CHUNK_SIZE = 10000
+
+# Tables holding rates, with their rate columns
+RATE_COLUMNS = [
+    (Data, ['inbound_rate', 'outbound_rate']),
+    (DataRollup5m, ['inbound_sum', 'inbound_min', 'inbound_max', 'outbound_sum', 'outbound_min', 'outbound_max']),
+    (DataRollupHour, ['inbound_sum', 'inbound_min', 'inbound_max', 'outbound_sum', 'outbound_min', 'outbound_max']),
+    (DataRollupDay, ['inbound_sum', 'inbound_min', 'inbound_max', 'outbound_sum', 'outbound_min', 'outbound_max']),
+]
+
+# Suffix of the integer columns filled next to the decimal ones on MySQL
+NEW_COLUMN_SUFFIX = '_int'
+
+class Command(BaseCommand):
+    help = (
+        'Converts the decimal rate columns of Data and of the rollups to whole bit/s in chunks of ids. '
+        'On MySQL the values are copied into new BIGINT columns which then replace the decimal ones, '
+        'so no statement rewrites a whole table while holding its lock; elsewhere they are rounded in place. '
+        'The migration run afterwards then has nothing left to convert.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help=f'Number of ids converted per UPDATE statement (default: {CHUNK_SIZE}).'
+        )
+        parser.add_argument(
+            '--start-id',
+            type=int,
+            default=None,
+            help='First Data id to convert, to continue a stopped run (see the last logged id).'
+        )
+
+    def handle(self, *args, **kwargs):
+        chunk_size = max(1, kwargs.get('chunk_size') or CHUNK_SIZE)
+        for model, columns in RATE_COLUMNS:
+            if connection.vendor == 'mysql' and not self.decimal_columns(model, columns):
+                self.stdout.write(self.style.SUCCESS(f'{model._meta.db_table} already stores integer rates.'))
+                continue
+            start_id = kwargs.get('start_id') if model is Data else None
+            self.convert_table(model, columns, chunk_size, start_id)
+
+    def decimal_columns(self, model, columns):
+        """Return the columns of `model` that are still DECIMAL (MySQL only)."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND DATA_TYPE = 'decimal'",
+                [model._meta.db_table]
+            )
+            return [name for (name,) in cursor.fetchall() if name in columns]
+
+    def convert_table(self, model, columns, chunk_size, start_id=None):
+        table = connection.ops.quote_name(model._meta.db_table)
+        quote = connection.ops.quote_name
+        bounds = model.objects.aggregate(first=Min('id'), last=Max('id'))
+
+        if connection.vendor == 'mysql':
+            # Adding nullable columns does not copy the table (instant on MySQL 8)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                    [model._meta.db_table]
+                )
+                existing = {name for (name,) in cursor.fetchall()}
+                added = [
+                    f"ADD COLUMN {quote(column + NEW_COLUMN_SUFFIX)} BIGINT NULL"
+                    for column in columns if column + NEW_COLUMN_SUFFIX not in existing
+                ]
+                if added:
+                    cursor.execute(f"ALTER TABLE {table} {', '.join(added)}")
+            # ROUND() of a DECIMAL rounds halves away from zero, as `bir.parse_rate` does
+            assignments = ', '.join(f"{quote(column + NEW_COLUMN_SUFFIX)} = ROUND({quote(column)})" for column in columns)
+        else:
+            assignments = ', '.join(f"{quote(column)} = CAST(ROUND({quote(column)}) AS BIGINT)" for column in columns)
+
+        if bounds['first'] is not None:
+            first = max(bounds['first'], start_id or bounds['first'])
+            self.stdout.write(self.style.SUCCESS(f"Converting {table} ids {first} to {bounds['last']}..."))
+            # Each chunk is its own short statement (autocommit), a stopped run continues with --start-id
+            for start in range(first, bounds['last'] + 1, chunk_size):
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"UPDATE {table} SET {assignments} WHERE id >= %s AND id < %s",
+                        [start, start + chunk_size]
+                    )
+                logger.info(f"Converted {table} up to id {start + chunk_size - 1}")
+
+        if connection.vendor == 'mysql':
+            # Swap the columns: dropping and renaming columns is instant on MySQL 8.0.29+
+            changes = [f"DROP COLUMN {quote(column)}" for column in columns]
+            changes += [f"RENAME COLUMN {quote(column + NEW_COLUMN_SUFFIX)} TO {quote(column)}" for column in columns]
+            with connection.cursor() as cursor:
+                cursor.execute(f"ALTER TABLE {table} {', '.join(changes)}")
+        self.stdout.write(self.style.SUCCESS(f'{table} converted to integer rates.'))
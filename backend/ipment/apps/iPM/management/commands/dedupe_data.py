@@ -0,0 +1,78 @@
+# command is: python manage.py dedupe_data
+# Run after `intern_circuits` and before the migration adding the unique (circuit, time) constraint.
+
+import logging
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Max
+from apps.iPM.models import Circuit, Data
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Number of circuits checked per transaction
+CHUNK_SIZE = 100
+
+# Number of ids per DELETE statement
+DELETE_SIZE = 1000
+
+class Command(BaseCommand):
+    help = 'Deletes duplicate Data rows (same circuit and time), keeping the most recently written one.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help=f'Number of circuits checked per transaction (default: {CHUNK_SIZE}).'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the duplicate rows.'
+        )
+
+    def handle(self, *args, **kwargs):
+        chunk_size = max(1, kwargs.get('chunk_size') or CHUNK_SIZE)
+        dry_run = kwargs.get('dry_run', False)
+        if Data.objects.filter(circuit__isnull=True).exists():
+            raise CommandError('Some Data rows are not linked to a circuit yet, run `python manage.py intern_circuits` first.')
+
+        circuit_ids = list(Circuit.objects.order_by('id').values_list('id', flat=True))
+        self.stdout.write(self.style.SUCCESS(f'Checking {len(circuit_ids)} circuits for duplicate samples...'))
+        total = 0
+        # Duplicates always share a circuit, so each chunk of circuits can be cleaned on its
+        # own; a stopped run is simply started again, cleaned circuits have nothing left to do
+        for start in range(0, len(circuit_ids), chunk_size):
+            chunk = circuit_ids[start:start + chunk_size]
+            duplicates = (
+                Data.objects.filter(circuit_id__in=chunk)
+                .values('circuit_id', 'time')
+                .annotate(copies=Count('id'), keep=Max('id'))
+                .filter(copies__gt=1)
+            )
+            keep = {(row['circuit_id'], row['time']): row['keep'] for row in duplicates}
+            if not keep:
+                continue
+
+            with transaction.atomic():
+                candidates = Data.objects.filter(
+                    circuit_id__in={circuit_id for circuit_id, _ in keep},
+                    time__in={time_obj for _, time_obj in keep}
+                ).values_list('id', 'circuit_id', 'time')
+                # The highest id is the row written last, like the ingestion upsert would keep
+                to_delete = [
+                    data_id for data_id, circuit_id, time_obj in candidates
+                    if (circuit_id, time_obj) in keep and data_id != keep[(circuit_id, time_obj)]
+                ]
+                if not dry_run:
+                    for index in range(0, len(to_delete), DELETE_SIZE):
+                        Data.objects.filter(id__in=to_delete[index:index + DELETE_SIZE]).delete()
+
+            total += len(to_delete)
+            logger.info(f"{total} duplicate rows {'found' if dry_run else 'deleted'} so far (circuit {chunk[-1]})")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} duplicate Data rows {'found' if dry_run else 'deleted'}."
+        ))
@@ -0,0 +1,127 @@
+# command is: python manage.py generate_exports --circuits 2000 --days 1 --output /tmp/nms-exports
+
+import os
+import io
+import csv
+import math
+import random
+import zipfile
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from apps.iPM.management.commands.bir import NAME_COLUMN, INBOUND_COLUMN, OUTBOUND_COLUMN, TIME_COLUMN
+
+# Defaults of the generated exports
+CIRCUITS = 1000
+INTERVAL_MINUTES = 5
+DAYS = 1
+INTERVALS_PER_FILE = 12  # One ZIP per hour of 5-minute samples
+
+def circuit_names(count, prefix):
+    """Return `count` MOEntity names shaped like the ones exported by the NMS."""
+    names = []
+    for index in range(count):
+        router = index // 48 + 1
+        port = index % 48
+        names.append(f"{prefix}-RTR-{router:04d}/GigabitEthernet0/{port // 24}/{port % 24}")
+    return names
+
+
+def rate_for(rng, base, sample_time):
+    """Return a rate in bit/s following a daily curve, with noise, like real traffic."""
+    hour = sample_time.hour + sample_time.minute / 60
+    daily = 0.55 + 0.45 * math.sin((hour - 9) / 24 * 2 * math.pi)
+    return round(max(0.0, base * daily * rng.uniform(0.85, 1.15)), 2)
+
+
+def write_export(zip_path, names, bases, sample_times, rng):
+    """
+    Write one ZIP file holding a single CSV in the exact NMS export format: UTF-8 with a
+    BOM, CRLF line endings, one row per circuit per sample time. Returns the row count.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([NAME_COLUMN, INBOUND_COLUMN, OUTBOUND_COLUMN, TIME_COLUMN])
+    for sample_time in sample_times:
+        time_str = sample_time.strftime('%m/%d/%Y %H:%M:%S')
+        for name, (inbound_base, outbound_base) in zip(names, bases):
+            writer.writerow([
+                name,
+                f"{rate_for(rng, inbound_base, sample_time):.2f}",
+                f"{rate_for(rng, outbound_base, sample_time):.2f}",
+                time_str
+            ])
+
+    member_name = os.path.splitext(os.path.basename(zip_path))[0] + '.csv'
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr(member_name, buffer.getvalue().encode('utf-8-sig'))
+    return len(names) * len(sample_times)
+
+
+def generate_exports(output, circuits=CIRCUITS, interval=INTERVAL_MINUTES, days=DAYS,
+                     intervals_per_file=INTERVALS_PER_FILE, start=None, prefix='BENCH', seed=0):
+    """
+    Generate synthetic NMS exports into `output` and return (ZIP paths, total rows).
+    """
+    rng = random.Random(seed)
+    names = circuit_names(circuits, prefix)
+    # Circuits differ a lot in size, from a few Mbit/s to 10 Gbit/s
+    bases = [(10 ** rng.uniform(6.5, 10), 10 ** rng.uniform(6.5, 10)) for _ in names]
+    if start is None:
+        start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days)
+
+    os.makedirs(output, exist_ok=True)
+    total_intervals = int(days * 24 * 60 / interval)
+    paths = []
+    total_rows = 0
+    for first in range(0, total_intervals, intervals_per_file):
+        sample_times = [
+            start + timedelta(minutes=interval * index)
+            for index in range(first, min(first + intervals_per_file, total_intervals))
+        ]
+        zip_path = os.path.join(output, f"{prefix}_{sample_times[0]:%Y%m%d%H%M}.zip")
+        total_rows += write_export(zip_path, names, bases, sample_times, rng)
+        paths.append(zip_path)
+    return paths, total_rows
+
+
+class Command(BaseCommand):
+    help = 'Generates synthetic NMS ZIP/CSV exports for testing and benchmarking bir.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', required=True, help='Folder receiving the ZIP files.')
+        parser.add_argument('--circuits', type=int, default=CIRCUITS, help=f'Number of circuits (default: {CIRCUITS}).')
+        parser.add_argument('--interval', type=int, default=INTERVAL_MINUTES, help=f'Minutes between samples (default: {INTERVAL_MINUTES}).')
+        parser.add_argument('--days', type=float, default=DAYS, help=f'Number of days of samples (default: {DAYS}).')
+        parser.add_argument(
+            '--intervals-per-file',
+            type=int,
+            default=INTERVALS_PER_FILE,
+            help=f'Sample times per ZIP file (default: {INTERVALS_PER_FILE}).'
+        )
+        parser.add_argument('--start', help='First sample time as YYYY-MM-DD (default: midnight, `days` days ago).')
+        parser.add_argument('--prefix', default='BENCH', help='Prefix of the circuit names and ZIP files (default: BENCH).')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, the same seed gives the same files (default: 0).')
+
+    def handle(self, *args, **kwargs):
+        if kwargs['circuits'] < 1 or kwargs['interval'] < 1 or kwargs['days'] <= 0 or kwargs['intervals_per_file'] < 1:
+            raise CommandError('--circuits, --interval, --days and --intervals-per-file must be positive.')
+        start = None
+        if kwargs.get('start'):
+            try:
+                start = datetime.strptime(kwargs['start'], '%Y-%m-%d')
+            except ValueError:
+                raise CommandError('Invalid --start, use YYYY-MM-DD.')
+
+        paths, total_rows = generate_exports(
+            kwargs['output'],
+            circuits=kwargs['circuits'],
+            interval=kwargs['interval'],
+            days=kwargs['days'],
+            intervals_per_file=kwargs['intervals_per_file'],
+            start=start,
+            prefix=kwargs['prefix'],
+            seed=kwargs['seed']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(paths)} ZIP file(s) with {total_rows} rows written to {kwargs['output']}"
+        ))
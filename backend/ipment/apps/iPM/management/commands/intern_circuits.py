@@ -0,0 +1,60 @@
+# command is: python manage.py intern_circuits
+
+import logging
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+from apps.iPM.models import Circuit, Data
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Number of Data ids scanned per transaction
+CHUNK_SIZE = 10000
+
+class Command(BaseCommand):
+    help = 'Moves the legacy Data.name strings into the Circuit registry and links rows by circuit id.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help=f'Number of Data ids scanned per transaction (default: {CHUNK_SIZE}).'
+        )
+
+    def handle(self, *args, **kwargs):
+        chunk_size = max(1, kwargs.get('chunk_size') or CHUNK_SIZE)
+        pending = Data.objects.filter(circuit__isnull=True)
+        bounds = pending.aggregate(first=Min('id'), last=Max('id'))
+        if bounds['first'] is None:
+            self.stdout.write(self.style.SUCCESS('All Data rows are already linked to a circuit.'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Interning circuit names for Data ids {bounds['first']} to {bounds['last']}..."
+        ))
+        total = 0
+        # Walk the primary key in ranges so every chunk is an index range scan,
+        # and a stopped run simply continues with the rows still missing a circuit
+        for start in range(bounds['first'], bounds['last'] + 1, chunk_size):
+            chunk = pending.filter(id__gte=start, id__lt=start + chunk_size)
+            ids_by_name = {}
+            for data_id, name in chunk.values_list('id', 'name'):
+                ids_by_name.setdefault(name or '', []).append(data_id)
+            if not ids_by_name:
+                continue
+
+            circuit_ids = Circuit.objects.intern(ids_by_name)
+            with transaction.atomic():
+                for name, data_ids in list(ids_by_name.items()):
+                    if name not in circuit_ids:
+                        del ids_by_name[name]  # Left unlinked, see the error logged by intern()
+                        continue
+                    Data.objects.filter(id__in=data_ids).update(circuit_id=circuit_ids[name], name=None)
+
+            total += sum(len(data_ids) for data_ids in ids_by_name.values())
+            logger.info(f"Linked {total} rows so far (up to id {start + chunk_size - 1})")
+
+        self.stdout.write(self.style.SUCCESS(f'{total} Data rows linked to {Circuit.objects.count()} circuits.'))
@@ -0,0 +1,124 @@
+# command is: python manage.py partition_data --setup   (once, MySQL)
+# then daily: python manage.py partition_data --retention-days 400
+
+import logging
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max, Min
+from django.utils import timezone
+from apps.iPM.models import Data
+from apps.iPM.rollups import RAW, set_compaction_mark
+from apps.iPM.partitions import (
+    add_partitions, boundaries_between, boundary_time, delete_before, drop_partitions, existing_partitions,
+    next_boundary, partition_name, partition_start, partition_table, partitioning_supported
+)
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Number of partitions kept ready past the current one
+AHEAD = 3
+
+class Command(BaseCommand):
+    help = (
+        'Manages the time partitions of the Data table: creates partitions ahead of time and '
+        'drops the expired ones. Rollups are kept, so long ranges stay available in list and list-top '
+        '(see also compact_data). '
+        'On databases without partitioning (SQLite) expired rows are deleted in chunks instead.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--setup',
+            action='store_true',
+            help='Partition the Data table (MySQL, rewrites the table once).'
+        )
+        parser.add_argument(
+            '--granularity',
+            choices=['month', 'day'],
+            default='month',
+            help='Time span of the new partitions (default: month).'
+        )
+        parser.add_argument(
+            '--ahead',
+            type=int,
+            default=AHEAD,
+            help=f'Number of partitions to keep ready past the current one (default: {AHEAD}).'
+        )
+        parser.add_argument(
+            '--retention-days',
+            type=int,
+            default=None,
+            help='Drop the partitions holding only rows older than this number of days (default: keep everything).'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only show what would be done.'
+        )
+
+    def handle(self, *args, **kwargs):
+        granularity = kwargs['granularity']
+        dry_run = kwargs.get('dry_run', False)
+        retention_days = kwargs.get('retention_days')
+        if retention_days is not None and retention_days < 1:
+            raise CommandError('--retention-days must be at least 1.')
+
+        today = timezone.now().date()
+        # The last partition to prepare holds the day `ahead` partitions from now
+        last_day = today
+        for _ in range(max(0, kwargs['ahead'])):
+            last_day = next_boundary(partition_start(last_day, granularity), granularity)
+
+        partitions = existing_partitions()
+        if kwargs.get('setup'):
+            if not partitioning_supported():
+                raise CommandError(f'Partitioning is only supported on MySQL, not {connection.vendor}.')
+            if partitions is not None:
+                raise CommandError('The Data table is already partitioned.')
+            bounds = Data.objects.aggregate(first=Min('time'), last=Max('time'))
+            first_day = bounds['first'].date() if bounds['first'] else today
+            if bounds['last'] and bounds['last'].date() > last_day:
+                last_day = bounds['last'].date()
+            boundaries = boundaries_between(first_day, last_day, granularity)
+            self.stdout.write(f"Partitioning Data into {len(boundaries)} partitions up to {boundaries[-1]}...")
+            if not dry_run:
+                partition_table(boundaries)
+            partitions = boundaries
+        elif partitions is not None:
+            # Create the missing partitions past the last boundary
+            boundaries = [boundary for boundary in boundaries_between(partitions[-1], last_day, granularity)
+                          if boundary > partitions[-1]]
+            if boundaries:
+                self.stdout.write(f"Adding partitions {', '.join(partition_name(boundary) for boundary in boundaries)}")
+                if not dry_run:
+                    add_partitions(boundaries)
+        elif partitioning_supported():
+            self.stdout.write(self.style.WARNING('The Data table is not partitioned, run with --setup first.'))
+
+        if retention_days is None:
+            self.stdout.write(self.style.SUCCESS('Partitions are ready.' if partitions is not None else 'Nothing to do.'))
+            return
+
+        cutoff = today - timedelta(days=retention_days)
+        if partitions is not None:
+            # Keep at least one partition, MySQL cannot drop all of them
+            expired = [boundary for boundary in partitions[:-1] if boundary <= cutoff]
+            if expired:
+                self.stdout.write(f"Dropping partitions {', '.join(partition_name(boundary) for boundary in expired)}")
+                if not dry_run:
+                    drop_partitions(expired)
+                    set_compaction_mark(RAW, boundary_time(expired[-1]))
+            self.stdout.write(self.style.SUCCESS(f'{len(expired)} expired partition(s) dropped.'))
+        else:
+            # Without partitions, delete the rows the expired partitions would have held
+            boundary = partition_start(cutoff, granularity)
+            if dry_run:
+                count = Data.objects.filter(time__lt=boundary_time(boundary)).count()
+                self.stdout.write(self.style.SUCCESS(f'{count} row(s) older than {boundary} would be deleted.'))
+                return
+            count = delete_before(boundary)
+            set_compaction_mark(RAW, boundary_time(boundary))
+            self.stdout.write(self.style.SUCCESS(f'{count} row(s) older than {boundary} deleted.'))
@@ -0,0 +1,44 @@
+# command is: python manage.py run_delete_jobs
+
+import logging
+from django.core.management.base import BaseCommand, CommandError
+from apps.iPM.deletes import CHUNK_SIZE, run_delete_job
+from apps.iPM.models import DeleteJob
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = (
+        'Runs the Data delete jobs left pending or running (for instance by a restart of the web server, '
+        'which runs them in background threads), or a given job again.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--job',
+            type=int,
+            default=None,
+            help='Id of a job to run again, even if it failed.'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help=f'Data rows deleted per transaction (default: {CHUNK_SIZE}).'
+        )
+
+    def handle(self, *args, **kwargs):
+        chunk_size = max(1, kwargs.get('chunk_size') or CHUNK_SIZE)
+        if kwargs.get('job'):
+            if not DeleteJob.objects.filter(pk=kwargs['job']).exists():
+                raise CommandError(f"Delete job {kwargs['job']} does not exist.")
+            job_ids = [kwargs['job']]
+        else:
+            job_ids = list(DeleteJob.objects.filter(status__in=['pending', 'running']).order_by('id').values_list('id', flat=True))
+
+        for job_id in job_ids:
+            job = run_delete_job(job_id, chunk_size)
+            logger.info(f"Delete job {job.pk} {job.status}: {job.deleted} rows deleted")
+        self.stdout.write(self.style.SUCCESS(f'{len(job_ids)} delete jobs run.'))
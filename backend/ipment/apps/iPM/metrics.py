@@ -0,0 +1,146 @@
+import os
+import json
+import time
+import logging
+import tempfile
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Default locations of the `bir` metrics, an empty path disables the output
+METRICS_LOG = '/var/log/bir-metrics.jsonl'
+METRICS_FILE = '/var/log/bir-metrics.prom'
+
+# Per-archive fields added up into the *_total counters of the metrics file
+COUNTER_FIELDS = [
+    ('csv_files', 'CSV files read from ZIP files.'),
+    ('rows_parsed', 'CSV rows parsed.'),
+    ('rows_inserted', 'Data rows inserted.'),
+    ('rows_updated', 'Existing Data rows updated.'),
+    ('rows_rejected', 'CSV rows written to the dead-letter folder.'),
+    ('parse_seconds', 'Seconds spent reading and parsing CSV rows.'),
+    ('db_seconds', 'Seconds spent writing batches to the database.'),
+    ('retries', 'CSV processing retries.'),
+]
+
+
+def new_csv_stats(source):
+    """Return an empty metrics record for one CSV file."""
+    return {
+        'type': 'csv',
+        'source': source,
+        'status': 'failed',
+        'rows_parsed': 0,
+        'rows_inserted': 0,
+        'rows_updated': 0,
+        'rows_rejected': 0,
+        'parse_seconds': 0.0,
+        'db_seconds': 0.0,
+        'retries': 0,
+        'newest_sample': None,
+    }
+
+
+def new_archive_stats(file_path):
+    """Return an empty metrics record for one ZIP file."""
+    stats = new_csv_stats(file_path)
+    stats.update({
+        'type': 'archive',
+        'csv_files': 0,
+        'csv_failed': 0,
+        'seconds': 0.0,
+        'worker': os.getpid(),
+    })
+    return stats
+
+
+class IngestMetrics:
+    """
+    Structured metrics of `bir` ingestion.
+    Every CSV and ZIP file produces one JSON line in `log_path`, including the lag between
+    its newest sample and the wall clock. ZIP records are also added to running totals that
+    are rewritten to `prom_path` in the Prometheus text format after every ZIP file.
+    """
+
+    def __init__(self, log_path=METRICS_LOG, prom_path=METRICS_FILE):
+        self.log_path = log_path
+        self.prom_path = prom_path
+        self.archives = {}
+        self.totals = {field: 0 for field, _ in COUNTER_FIELDS}
+        self.newest_sample = None
+
+    def record_csv(self, stats):
+        self.write_log(stats)
+
+    def record_archive(self, stats, log=True):
+        """
+        Add a ZIP record to the totals and rewrite the metrics file.
+        Records coming back from worker processes were already logged there (log=False).
+        """
+        if log:
+            self.write_log(stats)
+        self.archives[stats['status']] = self.archives.get(stats['status'], 0) + 1
+        for field, _ in COUNTER_FIELDS:
+            self.totals[field] += stats.get(field, 0)
+        newest = stats.get('newest_sample')
+        if newest is not None and (self.newest_sample is None or newest > self.newest_sample):
+            self.newest_sample = newest
+        self.write_prom()
+
+    def write_log(self, stats):
+        if not self.log_path:
+            return
+        record = dict(stats)
+        record['timestamp'] = timezone.now().isoformat()
+        newest = record.get('newest_sample')
+        if newest is not None:
+            record['newest_sample'] = newest.isoformat()
+            record['lag_seconds'] = round((timezone.now() - newest).total_seconds(), 3)
+        for field in ('parse_seconds', 'db_seconds', 'seconds'):
+            if field in record:
+                record[field] = round(record[field], 3)
+        try:
+            with open(self.log_path, 'a') as log_file:
+                log_file.write(json.dumps(record) + '\n')
+        except OSError as e:
+            logger.warning(f"Unable to write metrics log {self.log_path}: {e}")
+
+    def write_prom(self):
+        """
+        Rewrite the metrics file atomically so a scraper never reads half of it.
+        """
+        if not self.prom_path:
+            return
+        lines = [
+            '# HELP bir_archives_total ZIP files handled, by outcome.',
+            '# TYPE bir_archives_total counter',
+        ]
+        for status, count in sorted(self.archives.items()):
+            lines.append(f'bir_archives_total{{status="{status}"}} {count}')
+        for field, description in COUNTER_FIELDS:
+            name = f'bir_{field}_total'
+            lines += [f'# HELP {name} {description}', f'# TYPE {name} counter', f'{name} {self.totals[field]}']
+        if self.newest_sample is not None:
+            lines += [
+                '# HELP bir_newest_sample_timestamp_seconds Time of the newest ingested sample.',
+                '# TYPE bir_newest_sample_timestamp_seconds gauge',
+                f'bir_newest_sample_timestamp_seconds {self.newest_sample.timestamp()}',
+                '# HELP bir_lag_seconds Seconds between the newest ingested sample and the last update.',
+                '# TYPE bir_lag_seconds gauge',
+                f'bir_lag_seconds {(timezone.now() - self.newest_sample).total_seconds():.3f}',
+            ]
+        lines += [
+            '# HELP bir_last_update_timestamp_seconds Time this file was written.',
+            '# TYPE bir_last_update_timestamp_seconds gauge',
+            f'bir_last_update_timestamp_seconds {time.time():.3f}',
+        ]
+
+        directory = os.path.dirname(self.prom_path) or '.'
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.bir-metrics-')
+            with os.fdopen(fd, 'w') as prom_file:
+                prom_file.write('\n'.join(lines) + '\n')
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.prom_path)
+        except OSError as e:
+            logger.warning(f"Unable to write metrics file {self.prom_path}: {e}")
@@ -1,13 +1,201 @@
-from django.db import models
+import logging
+import unicodedata
+from django.db import models, transaction
+from django.contrib.auth.models import User
+
+logger = logging.getLogger(__name__)
+
+def collation_key(name):
+    """
+    Return the key two circuit names share when the database compares them as equal under
+    a case- and accent-insensitive collation (MySQL's default): 'Gi0/1' and 'gi0/1'.
+    """
+    decomposed = unicodedata.normalize('NFKD', name)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+class CircuitManager(models.Manager):
+    # Process-wide name -> id cache, circuits are never renamed once registered
+    _ids = {}
+
+    def intern(self, names):
+        """
+        Return a {name: id} dict for the given circuit names, registering unknown ones.
+        Names already seen by this process are answered from memory. Ids are only cached
+        outside of transactions, so a rollback cannot leave unknown ids in the cache.
+        Under a case- or accent-insensitive collation the database may answer with the
+        spelling it stored first: such names get the id of that circuit. Names that can
+        still be neither registered nor found are logged and left out of the result.
+        """
+        names = set(names)
+        missing = names.difference(self._ids)
+        if not missing:
+            return {name: self._ids[name] for name in names}
+
+        found = dict(self.filter(name__in=missing).values_list('name', 'id'))
+        new_names = missing.difference(found)
+        if new_names:
+            self.bulk_create([self.model(name=name) for name in new_names], ignore_conflicts=True)
+            found.update(self.filter(name__in=new_names).values_list('name', 'id'))
+
+        # Match the names the database returned in another spelling back to the requested ones
+        ids = {name: found[name] for name in missing if name in found}
+        if len(ids) < len(missing):
+            ids_by_key = {collation_key(name): circuit_id for name, circuit_id in found.items()}
+            for name in missing.difference(ids):
+                if collation_key(name) in ids_by_key:
+                    ids[name] = ids_by_key[collation_key(name)]
+            unresolved = missing.difference(ids)
+            if unresolved:
+                logger.error(f"Circuits {sorted(unresolved)} could not be registered or found (name collation mismatch)")
+
+        if not transaction.get_connection(self.db).in_atomic_block:
+            self._ids.update(ids)
+        return {name: ids[name] if name in ids else self._ids[name] for name in names if name in ids or name in self._ids}
+
+    def forget_deleted(self):
+        """
+        Drop the cached ids of circuits deleted since (in the admin, for instance), so that
+        intern() registers their names again instead of returning ids no row points to.
+        """
+        cached_ids = list(set(self._ids.values()))
+        existing = set()
+        for start in range(0, len(cached_ids), 1000):
+            existing.update(self.filter(id__in=cached_ids[start:start + 1000]).values_list('id', flat=True))
+        for name, circuit_id in list(self._ids.items()):
+            if circuit_id not in existing:
+                del self._ids[name]
+
+class Circuit(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = CircuitManager()
+
+    def __str__(self):
+        return self.name
 
 class Data(models.Model):
-    name = models.CharField(max_length=255, blank=False, null=False)
-    inbound_rate = models.DecimalField(max_digits=30, decimal_places=2, blank=False, null=True)
-    outbound_rate = models.DecimalField(max_digits=30, decimal_places=2, blank=False, null=True)
+    # No database-level foreign key: MySQL does not allow them on the partitioned Data table
+    # (see `python manage.py partition_data`), deleting a Circuit still deletes its rows
+    circuit = models.ForeignKey(Circuit, on_delete=models.CASCADE, related_name='data', null=True, db_constraint=False)
+    # Legacy circuit name column, moved into `circuit` and emptied by `python manage.py intern_circuits`
+    name = models.CharField(max_length=255, blank=True, null=True)
+    # Rates in whole bit/s; run `python manage.py convert_rates` before migrating a table
+    # that still has the former decimal columns (see the command for the steps)
+    inbound_rate = models.BigIntegerField(blank=False, null=True)
+    outbound_rate = models.BigIntegerField(blank=False, null=True)
     time = models.DateTimeField()
-    
+
+    class Meta:
+        # One sample per circuit and time; run `python manage.py dedupe_data` before
+        # migrating a table that may hold duplicates, or the migration will fail
+        constraints = [
+            models.UniqueConstraint(fields=['circuit', 'time'], name='unique_data_circuit_time')
+        ]
+        indexes = [
+            models.Index(fields=['time'], name='data_time_idx')
+        ]
+
     def __str__(self):
-        return self.name
+        return self.circuit.name if self.circuit_id else (self.name or '')
+
+class CircuitLatest(models.Model):
+    # Newest Data sample of each circuit, upserted by `bir` (see apps/iPM/latest.py)
+    circuit = models.OneToOneField(Circuit, on_delete=models.CASCADE, primary_key=True, related_name='latest')
+    time = models.DateTimeField(db_index=True)
+    inbound_rate = models.BigIntegerField(null=True)
+    outbound_rate = models.BigIntegerField(null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.circuit.name} - {self.time}"
+
+class Rollup(models.Model):
+    # Aggregate of one circuit's Data samples in [bucket, bucket + resolution), kept up to
+    # date by `bir` (see apps/iPM/rollups.py); the average rate is sum / count
+    circuit = models.ForeignKey(Circuit, on_delete=models.CASCADE, related_name='+')
+    bucket = models.DateTimeField()
+    count = models.IntegerField(default=0)
+    inbound_sum = models.BigIntegerField(null=True)
+    inbound_min = models.BigIntegerField(null=True)
+    inbound_max = models.BigIntegerField(null=True)
+    outbound_sum = models.BigIntegerField(null=True)
+    outbound_min = models.BigIntegerField(null=True)
+    outbound_max = models.BigIntegerField(null=True)
+    # Quantile sketches of the rates in the bucket (see apps/iPM/sketches.py)
+    inbound_sketch = models.BinaryField(null=True)
+    outbound_sketch = models.BinaryField(null=True)
+
+    class Meta:
+        abstract = True
+        constraints = [
+            models.UniqueConstraint(fields=['circuit', 'bucket'], name='unique_%(class)s_circuit_bucket')
+        ]
+        indexes = [
+            models.Index(fields=['bucket'], name='%(class)s_bucket_idx')
+        ]
+
+    @property
+    def inbound_avg(self):
+        return self.inbound_sum / self.count if self.count and self.inbound_sum is not None else None
+
+    @property
+    def outbound_avg(self):
+        return self.outbound_sum / self.count if self.count and self.outbound_sum is not None else None
+
+    def __str__(self):
+        return f"{self.circuit.name} - {self.bucket}"
+
+class DataRollup5m(Rollup):
+    pass
+
+class DataRollupHour(Rollup):
+    pass
+
+class DataRollupDay(Rollup):
+    pass
+
+class CompactionMark(models.Model):
+    # Data ('raw') or rollup level deleted by `compact_data` before `compacted_before`
+    level = models.CharField(max_length=16, unique=True)
+    compacted_before = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.level} - {self.compacted_before}"
+
+class ArchivedDay(models.Model):
+    # UTC day whose Data rows were moved to the cold archive by `archive_data` (see apps/iPM/archive.py)
+    day = models.DateField(unique=True)
+    rows = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.day} - {self.rows} rows"
+
+class DeleteJob(models.Model):
+    # Bulk delete of Data rows run in chunks in the background (see apps/iPM/deletes.py)
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    filters = models.JSONField(default=dict)  # {'circuit': ...} or {'start_date': ..., 'end_date': ...}
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    total = models.BigIntegerField(default=0)  # Database rows matching when the job started
+    deleted = models.BigIntegerField(default=0)
+    # Deleted ids as [first id, last id, count] entries, one per chunk, merged beyond a bound
+    # (see deletes.add_id_range): the ids lie within each entry and the counts are exact
+    id_ranges = models.JSONField(default=list, null=True)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filters} - {self.status}"
 
 class Dashboard(models.Model):
     name = models.CharField(max_length=255, blank=False, null=False)
@@ -19,6 +207,36 @@ class Dashboard(models.Model):
     
     def __str__(self):
         return f"{self.name} - {self.description}"
+
+class IngestArchive(models.Model):
+    # Ingest ledger used by `bir`: one row per distinct ZIP content
+    sha256 = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255)
+    size = models.BigIntegerField(default=0)
+    completed = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} - {self.sha256}"
+
+class IngestMember(models.Model):
+    # Checkpoint of one CSV inside an ingested ZIP: rows and batches committed so far
+    archive = models.ForeignKey(IngestArchive, on_delete=models.CASCADE, related_name='members')
+    name = models.CharField(max_length=255)
+    rows_committed = models.BigIntegerField(default=0)
+    batches_committed = models.IntegerField(default=0)
+    completed = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['archive', 'name'], name='unique_ingest_member')
+        ]
+
+    def __str__(self):
+        return f"{self.archive.name} - {self.name}"
     
 # class Token(models.Model):
 #     token = models.CharField(max_length=255, blank=False, null=False)
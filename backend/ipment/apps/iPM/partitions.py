@@ -0,0 +1,141 @@
+import logging
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from django.db import connection, transaction
+from apps.iPM.models import Data
+
+logger = logging.getLogger(__name__)
+
+# Catch-all partition holding rows past the last planned boundary, split when partitions are added
+FUTURE_PARTITION = 'pfuture'
+
+# Rows deleted per statement where the database has no partitions
+DELETE_CHUNK_SIZE = 10000
+
+
+def next_boundary(day, granularity):
+    """Return the first day of the partition following the one holding `day`."""
+    if granularity == 'day':
+        return day + timedelta(days=1)
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def partition_start(day, granularity):
+    """Return the first day of the partition holding `day`."""
+    return day if granularity == 'day' else day.replace(day=1)
+
+
+def partition_name(boundary):
+    """Partitions are named after their exclusive upper boundary: p20250101 holds rows before 2025-01-01."""
+    return f"p{boundary:%Y%m%d}"
+
+
+def partition_boundary(name):
+    return date(int(name[1:5]), int(name[5:7]), int(name[7:9]))
+
+
+def boundaries_between(first_day, last_day, granularity):
+    """Return the partition boundaries needed to hold every row from `first_day` to `last_day`."""
+    boundaries = []
+    boundary = next_boundary(partition_start(first_day, granularity), granularity)
+    while True:
+        boundaries.append(boundary)
+        if boundary > last_day:
+            return boundaries
+        boundary = next_boundary(boundary, granularity)
+
+
+def boundary_time(boundary):
+    """Partition boundaries are UTC days, like the datetimes Django stores in MySQL."""
+    return datetime(boundary.year, boundary.month, boundary.day, tzinfo=dt_timezone.utc)
+
+
+def partitioning_supported():
+    return connection.vendor == 'mysql'
+
+
+def quoted_table():
+    return connection.ops.quote_name(Data._meta.db_table)
+
+
+def partition_clause(boundaries):
+    definitions = [
+        f"PARTITION {partition_name(boundary)} VALUES LESS THAN (TO_DAYS('{boundary:%Y-%m-%d}'))"
+        for boundary in boundaries
+    ]
+    definitions.append(f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE")
+    return ', '.join(definitions)
+
+
+def existing_partitions():
+    """
+    Return the boundaries of the Data partitions, oldest first, or None when the table is
+    not partitioned (always None outside MySQL).
+    """
+    if not partitioning_supported():
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL "
+            "ORDER BY PARTITION_ORDINAL_POSITION",
+            [Data._meta.db_table]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    if not names:
+        return None
+    return [partition_boundary(name) for name in names if name != FUTURE_PARTITION]
+
+
+def partition_table(boundaries):
+    """
+    Turn the Data table into a table partitioned by day ranges of `time` (MySQL only).
+    MySQL requires the partitioning column in every unique key and does not allow foreign
+    keys on partitioned tables, so the primary key becomes (id, time) and the foreign key
+    to Circuit is dropped (the model declares it with db_constraint=False). This rewrites
+    the whole table once.
+    """
+    table = quoted_table()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS "
+            "WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            [Data._meta.db_table]
+        )
+        for (constraint_name,) in cursor.fetchall():
+            cursor.execute(f"ALTER TABLE {table} DROP FOREIGN KEY {connection.ops.quote_name(constraint_name)}")
+        cursor.execute(f"ALTER TABLE {table} DROP PRIMARY KEY, ADD PRIMARY KEY (id, time)")
+        cursor.execute(f"ALTER TABLE {table} PARTITION BY RANGE (TO_DAYS(time)) ({partition_clause(boundaries)})")
+
+
+def add_partitions(boundaries):
+    """Split new partitions off the catch-all partition, which is empty in normal operation."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"ALTER TABLE {quoted_table()} REORGANIZE PARTITION {FUTURE_PARTITION} "
+            f"INTO ({partition_clause(boundaries)})"
+        )
+
+
+def drop_partitions(boundaries):
+    """Drop whole partitions, which takes the same time whatever the number of rows in them."""
+    names = ', '.join(partition_name(boundary) for boundary in boundaries)
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {quoted_table()} DROP PARTITION {names}")
+
+
+def delete_before(boundary, chunk_size=DELETE_CHUNK_SIZE):
+    """
+    Fallback for databases without partitions (SQLite in development): delete the rows
+    older than `boundary` in chunks of ids, each in its own short transaction.
+    Returns the number of deleted rows.
+    """
+    total = 0
+    expired = Data.objects.filter(time__lt=boundary_time(boundary))
+    while True:
+        with transaction.atomic():
+            ids = list(expired.values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                return total
+            Data.objects.filter(id__in=ids).delete()
+        total += len(ids)
+        logger.info(f"Deleted {total} rows older than {boundary} so far")
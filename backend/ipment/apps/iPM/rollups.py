@@ -0,0 +1,414 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db import connection
+from django.db.models.constants import OnConflict
+from apps.iPM.models import ArchivedDay, CompactionMark, Data, DataRollup5m, DataRollupHour, DataRollupDay
+from apps.iPM.sketches import add_rate, encode_sketch, merge_sketch, rate_key
+
+# Rollup levels from finest to coarsest: (name, bucket seconds, model).
+# Each level is computed from the one before it, the first one from Data.
+ROLLUPS = [
+    ('5min', 300, DataRollup5m),
+    ('hour', 3600, DataRollupHour),
+    ('day', 86400, DataRollupDay),
+]
+
+# Level name of the raw Data rows in CompactionMark
+RAW = 'raw'
+
+# Key of the set of archived UTC days in the compaction marks
+ARCHIVED = 'archived'
+
+# Aggregate columns of a rollup row, in the order used by the tuples below
+AGGREGATE_FIELDS = ['count', 'inbound_sum', 'inbound_min', 'inbound_max', 'outbound_sum', 'outbound_min', 'outbound_max']
+
+# Quantile sketch columns of a rollup row (inbound, outbound)
+SKETCH_FIELDS = ['inbound_sketch', 'outbound_sketch']
+
+
+def bucket_start(value, seconds):
+    """Return the start of the `seconds` long bucket holding `value`, buckets are aligned on UTC."""
+    timestamp = int(value.timestamp())
+    return datetime.fromtimestamp(timestamp - timestamp % seconds, tz=dt_timezone.utc)
+
+
+def compaction_marks(days=None):
+    """
+    Return a {level name: time} dict of the levels deleted by `compact_data` before that
+    time, plus the set of UTC days moved to the cold archive by `archive_data` under
+    ARCHIVED (only the ones among `days` when given).
+    """
+    marks = dict(CompactionMark.objects.values_list('level', 'compacted_before'))
+    archived = ArchivedDay.objects.all() if days is None else ArchivedDay.objects.filter(day__in=days)
+    marks[ARCHIVED] = set(archived.values_list('day', flat=True))
+    return marks
+
+
+def utc_day(value):
+    return value.astimezone(dt_timezone.utc).date()
+
+
+def raw_rows_removed(time_obj, marks):
+    """Return True if the Data rows at `time_obj` were compacted or archived, so none may be written."""
+    return is_compacted(RAW, time_obj, marks) or utc_day(time_obj) in marks[ARCHIVED]
+
+
+def set_compaction_mark(level, compacted_before):
+    """Move the compaction mark of a level forward to `compacted_before`."""
+    mark, created = CompactionMark.objects.get_or_create(level=level, defaults={'compacted_before': compacted_before})
+    if not created and mark.compacted_before < compacted_before:
+        mark.compacted_before = compacted_before
+        mark.save()
+
+
+def merge(total, values):
+    """Add a (count, in sum, in min, in max, out sum, out min, out max) tuple to another one."""
+    if total is None:
+        return list(values)
+    total[0] += values[0]
+    for index in (1, 4):
+        if values[index] is not None:
+            total[index] = values[index] if total[index] is None else total[index] + values[index]
+    for index in (2, 5):
+        if values[index] is not None and (total[index] is None or values[index] < total[index]):
+            total[index] = values[index]
+    for index in (3, 6):
+        if values[index] is not None and (total[index] is None or values[index] > total[index]):
+            total[index] = values[index]
+    return total
+
+
+def write_buckets(model, totals, sketches):
+    """
+    Upsert rollup rows from {(circuit id, bucket): aggregates} and {(circuit id, bucket):
+    (in, out sketch)} dicts. The statements are the ones bulk_create(update_conflicts=True)
+    runs, built from the backend's own SQL pieces, without a model instance and a field by
+    field preparation per row: `bir` writes about as many rollup rows as Data rows.
+    """
+    ops = connection.ops
+    fields = [model._meta.get_field(name) for name in ['circuit', 'bucket', *AGGREGATE_FIELDS, *SKETCH_FIELDS]]
+    buckets = {}
+    placeholder_rows = []
+    params = []
+    for key, values in totals.items():
+        if key[1] not in buckets:
+            buckets[key[1]] = ops.adapt_datetimefield_value(key[1])
+        inbound_sketch, outbound_sketch = encode_sketch(sketches[key][0]), encode_sketch(sketches[key][1])
+        placeholder_rows.append(['%s'] * (2 + len(AGGREGATE_FIELDS)) + [ops.binary_placeholder_sql(inbound_sketch), ops.binary_placeholder_sql(outbound_sketch)])
+        params.append([key[0], buckets[key[1]], *values, inbound_sketch, outbound_sketch])
+    if not params:
+        return
+
+    columns = ', '.join(ops.quote_name(field.column) for field in fields)
+    on_conflict = ops.on_conflict_suffix_sql(
+        fields,
+        OnConflict.UPDATE,
+        [field.column for field in fields[2:]],
+        ['circuit_id', 'bucket']
+    )
+    batch_size = ops.bulk_batch_size(fields, params)
+    with connection.cursor() as cursor:
+        for start in range(0, len(params), batch_size):
+            cursor.execute(
+                f"INSERT INTO {ops.quote_name(model._meta.db_table)} ({columns}) "
+                f"{ops.bulk_insert_sql(fields, placeholder_rows[start:start + batch_size])} {on_conflict}",
+                [value for row in params[start:start + batch_size] for value in row]
+            )
+
+
+def sample_buckets(keys, seconds):
+    """Return a {(circuit id, time): (circuit id, bucket)} dict of samples for one rollup level."""
+    starts = {}
+    buckets = {}
+    for circuit_id, time_obj in keys:
+        if time_obj not in starts:
+            starts[time_obj] = bucket_start(time_obj, seconds)
+        buckets[(circuit_id, time_obj)] = (circuit_id, starts[time_obj])
+    return buckets
+
+
+def read_buckets(queryset, buckets, rollups):
+    """Add the (aggregates..., inbound sketch, outbound sketch) of the given buckets in a rollup queryset to a dict."""
+    for row in queryset.values_list('circuit_id', 'bucket', *AGGREGATE_FIELDS, *SKETCH_FIELDS):
+        if (row[0], row[1]) in buckets:
+            rollups[(row[0], row[1])] = row[2:]
+    return rollups
+
+
+def lock_days(keys):
+    """
+    Lock the daily rollup rows holding the given (circuit id, time) samples, creating empty
+    ones for days without a row, and return them as a {(circuit id, bucket): (aggregates...,
+    inbound sketch, outbound sketch)} dict. Every finer bucket lies in one daily bucket, so
+    transactions writing the rollups of the same samples run one after the other. Rows are
+    locked in (circuit, bucket) order, so concurrent transactions cannot deadlock on them.
+    """
+    model = ROLLUPS[-1][2]
+    buckets = set(sample_buckets(keys, ROLLUPS[-1][1]).values())
+    if not buckets:
+        return {}
+    queryset = model.objects.filter(
+        circuit_id__in={circuit_id for circuit_id, _ in buckets},
+        bucket__in={bucket for _, bucket in buckets}
+    ).order_by('circuit_id', 'bucket').select_for_update()
+    rollups = read_buckets(queryset, buckets, {})
+    new_days = buckets.difference(rollups)
+    if new_days:
+        # Empty rows to lock, a transaction creating the same ones concurrently waits for this one
+        model.objects.bulk_create([model(circuit_id=circuit_id, bucket=bucket) for circuit_id, bucket in sorted(new_days)], ignore_conflicts=True)
+        read_buckets(queryset.filter(circuit_id__in={circuit_id for circuit_id, _ in new_days}), new_days, rollups)
+    return rollups
+
+
+def lock_rollups(keys):
+    """
+    Lock the daily rollup rows holding the given (circuit id, time) samples (see lock_days)
+    and return the rows of every level holding them as a {model: {(circuit id, bucket):
+    (aggregates..., inbound sketch, outbound sketch)}} dict. Call it first in the transaction
+    writing the samples: a batch writing samples of the same buckets waits for this one to
+    commit, and then reads the rollups (and looks up its samples) after it.
+    """
+    days = lock_days(keys)
+    rollups = {}
+    for _, seconds, model in ROLLUPS:
+        buckets = set(sample_buckets(keys, seconds).values())
+        if model is ROLLUPS[-1][2]:
+            rollups[model] = days
+        elif buckets:
+            queryset = model.objects.filter(
+                circuit_id__in={circuit_id for circuit_id, _ in buckets},
+                bucket__in={bucket for _, bucket in buckets}
+            )
+            rollups[model] = read_buckets(queryset, buckets, {})
+        else:
+            rollups[model] = {}
+        # Buckets without a row yet hold no samples
+        for bucket in buckets.difference(rollups[model]):
+            rollups[model][bucket] = (0, None, None, None, None, None, None, None, None)
+    return rollups
+
+
+def remove_rates(total, sketches, row, rates):
+    """
+    Subtract the old rates of a rewritten sample from the aggregates and sketches of a bucket
+    whose stored values are `row`. Returns False when that is not exact: the old rate may be
+    the min or max of the bucket, or a rate becomes missing (the sum may become None).
+    """
+    for offset, (old_rate, sketch) in enumerate(zip(rates, sketches)):
+        if old_rate is None:
+            continue
+        index = 1 + 3 * offset  # Sum, then min and max
+        low, high = row[index + 1], row[index + 2]
+        key = rate_key(old_rate)
+        if low is None or not low < old_rate < high or total[index] is None or not sketch.get(key):
+            return False
+        total[index] -= old_rate
+        sketch[key] -= 1
+        if not sketch[key]:
+            del sketch[key]
+    return True
+
+
+def add_to_rollups(rows, old_rows, locked):
+    """
+    Apply written samples to the rollup rows read by lock_rollups, level by level, without
+    reading Data or the finer levels. `rows` holds the written {(circuit id, time): (inbound,
+    outbound)} samples and `old_rows` the rates the existing ones had before. New samples are
+    counted, added to the sums and sketches and extend the mins and maxes; rewritten samples
+    have their old rates subtracted first, unchanged ones are skipped. A bucket whose samples
+    are all rewritten is replaced by the new ones. When a subtraction is not exact (see
+    remove_rates), or the rollups of existing samples were never built, the buckets of those
+    samples are recomputed with update_rollups instead.
+    """
+    changed = {key: rates for key, rates in rows.items() if key not in old_rows or old_rows[key] != rates}
+    recompute = set()
+    for _, seconds, model in ROLLUPS:
+        current = locked[model]
+        buckets = sample_buckets(rows, seconds)
+        # Existing samples in a bucket holding none: the rollups were never built for them
+        recompute.update(key for key in old_rows if not current[buckets[key]][0])
+
+        added = {}
+        added_sketches = {}
+        removed = {}
+        for key, rates in changed.items():
+            bucket = buckets[key]
+            inbound, outbound = rates
+            added[bucket] = merge(added.get(bucket), (1, inbound, inbound, inbound, outbound, outbound, outbound))
+            inbound_sketch, outbound_sketch = added_sketches.setdefault(bucket, ({}, {}))
+            add_rate(inbound_sketch, inbound)
+            add_rate(outbound_sketch, outbound)
+            if key in old_rows:
+                removed.setdefault(bucket, []).append((key, old_rows[key]))
+
+        totals = {}
+        sketches = {}
+        for bucket, values in added.items():
+            row = current[bucket]
+            old_samples = removed.get(bucket, [])
+            if len(old_samples) == row[0]:
+                # A new bucket, or every sample of it was rewritten: the new ones are the bucket
+                totals[bucket] = values
+                sketches[bucket] = added_sketches[bucket]
+                continue
+            total = list(row[:7])
+            bucket_sketches = (merge_sketch({}, row[7]), merge_sketch({}, row[8]))
+            if len(old_samples) > row[0] or not all(remove_rates(total, bucket_sketches, row, rates) for _, rates in old_samples):
+                recompute.add(old_samples[0][0])
+                continue
+            total[0] -= len(old_samples)
+            totals[bucket] = merge(total, values)
+            for sketch, new_sketch in zip(bucket_sketches, added_sketches[bucket]):
+                for key, count in new_sketch.items():
+                    sketch[key] = sketch.get(key, 0) + count
+            sketches[bucket] = bucket_sketches
+        write_buckets(model, totals, sketches)
+
+    if recompute:
+        update_rollups(recompute)
+
+
+def update_rollups(keys):
+    """
+    Recompute every rollup bucket holding one of the given (circuit id, time) samples.
+    5-minute buckets are rebuilt from Data, hourly ones from the 5-minute buckets and daily
+    ones from the hourly buckets, so a rewritten or deleted sample is never counted twice.
+    Buckets left without samples are deleted. Call it in the transaction writing the samples:
+    their daily rows are locked first (see lock_days), like `bir` does before adding samples.
+    The quantile sketches of the buckets are rebuilt the same way, from the raw rates or by
+    merging the finer sketches. `bir` adds its samples with add_to_rollups, this full
+    recompute is for deleted samples and the rewrites add_to_rollups cannot apply exactly.
+    Samples of compacted or archived days are ignored: their raw rows are gone, and
+    recomputing their buckets would drop the samples that were there.
+    """
+    source_keys = set(keys)
+    marks = compaction_marks({utc_day(time_obj) for _, time_obj in source_keys})
+    source_keys = {key for key in source_keys if not raw_rows_removed(key[1], marks)}
+    lock_days(source_keys)
+    source_model = Data
+    for _, seconds, model in ROLLUPS:
+        if not source_keys:
+            return
+        buckets = {(circuit_id, bucket_start(time_obj, seconds)) for circuit_id, time_obj in source_keys}
+        circuit_ids = {circuit_id for circuit_id, _ in buckets}
+        first = min(bucket for _, bucket in buckets)
+        last = max(bucket for _, bucket in buckets) + timedelta(seconds=seconds)
+
+        # Read the finer level once for the whole time window, and keep the affected buckets
+        totals = {}
+        sketches = {}
+        if source_model is Data:
+            rows = Data.objects.filter(circuit_id__in=circuit_ids, time__gte=first, time__lt=last).values_list(
+                'circuit_id', 'time', 'inbound_rate', 'outbound_rate'
+            )
+            rows = ((circuit_id, time_obj, (1, inbound, inbound, inbound, outbound, outbound, outbound), (inbound, outbound))
+                    for circuit_id, time_obj, inbound, outbound in rows)
+            add = add_rate
+        else:
+            rows = source_model.objects.filter(circuit_id__in=circuit_ids, bucket__gte=first, bucket__lt=last).values_list(
+                'circuit_id', 'bucket', *AGGREGATE_FIELDS, *SKETCH_FIELDS
+            )
+            rows = ((row[0], row[1], row[2:-2], row[-2:]) for row in rows)
+            add = merge_sketch
+        for circuit_id, time_obj, values, rates in rows:
+            key = (circuit_id, bucket_start(time_obj, seconds))
+            if key in buckets:
+                totals[key] = merge(totals.get(key), values)
+                inbound_sketch, outbound_sketch = sketches.setdefault(key, ({}, {}))
+                add(inbound_sketch, rates[0])
+                add(outbound_sketch, rates[1])
+
+        write_buckets(model, totals, sketches)
+        empty = {}
+        for circuit_id, bucket in buckets.difference(totals):
+            empty.setdefault(bucket, []).append(circuit_id)
+        for bucket, empty_circuit_ids in empty.items():
+            model.objects.filter(bucket=bucket, circuit_id__in=empty_circuit_ids).delete()
+
+        source_keys = buckets
+        source_model = model
+
+
+def delete_rollups_range(start, end):
+    """
+    Update the rollups after the samples between `start` and `end` (inclusive) were deleted:
+    buckets inside the range are deleted, and the ones overlapping its ends are recomputed.
+    """
+    edge_keys = set()
+    for _, seconds, model in ROLLUPS:
+        first = bucket_start(start, seconds)
+        last = bucket_start(end, seconds)
+        model.objects.filter(bucket__gte=first + timedelta(seconds=seconds), bucket__lt=last).delete()
+        for circuit_id in model.objects.filter(bucket__in=[first, last]).values_list('circuit_id', flat=True):
+            edge_keys.update([(circuit_id, start), (circuit_id, end)])
+    update_rollups(edge_keys)
+
+
+def pick_resolution(start, end, points, marks=None):
+    """
+    Return the coarsest (name, seconds, model) rollup level that still gives at least
+    `points` buckets between `start` and `end`, or None when raw samples are needed.
+    Levels compacted at `start` are skipped; if the raw samples are, the finest level
+    still available is returned even when it gives fewer points (also with points=None).
+    """
+    marks = compaction_marks() if marks is None else marks
+    available = [rollup for rollup in ROLLUPS if is_available(rollup[0], start, marks)]
+    span = (end - start).total_seconds()
+    if points:
+        for rollup in reversed(available):
+            if span / rollup[1] >= points:
+                return rollup
+    if is_available(RAW, start, marks):
+        return None
+    return available[0] if available else ROLLUPS[-1]
+
+
+def is_compacted(level, time_obj, marks):
+    return marks.get(level) is not None and time_obj < marks[level]
+
+
+def is_available(level, time_obj, marks):
+    """Raw samples of archived days are still available, from the cold archive."""
+    if level == RAW and utc_day(time_obj) in marks[ARCHIVED]:
+        return True
+    return not is_compacted(level, time_obj, marks)
+
+
+def range_segments(start, end, marks=None):
+    """
+    Split the samples between `start` and `end` (inclusive) into (model, lo, hi) segments
+    holding exactly the same samples: whole daily buckets in the middle, then hourly and
+    5-minute buckets towards the ends, and raw Data rows for what is left. `lo` and `hi`
+    bound the bucket (or time) column, `lo` included and `hi` excluded.
+    An end falling in a compacted level is read from the whole bucket of the next level
+    still available, so old ranges are widened to that level's bucket boundaries.
+    """
+    marks = compaction_marks() if marks is None else marks
+    levels = [(RAW, None, Data)] + ROLLUPS
+    segments = []
+    for model, lo, hi in split_range(start, end + timedelta(microseconds=1), len(ROLLUPS)):
+        level = next(index for index, (_, _, level_model) in enumerate(levels) if level_model is model)
+        while level < len(ROLLUPS) and not is_available(levels[level][0], lo, marks):
+            # Edge segments lie inside a single bucket of the next level, use that bucket
+            level += 1
+            _, seconds, model = levels[level]
+            lo = bucket_start(lo, seconds)
+            hi = lo + timedelta(seconds=seconds)
+        if (model, lo, hi) not in segments:
+            segments.append((model, lo, hi))
+    return segments
+
+
+def split_range(start, end, level):
+    if start >= end:
+        return []
+    if level == 0:
+        return [(Data, start, end)]
+
+    _, seconds, model = ROLLUPS[level - 1]
+    first = bucket_start(start, seconds)
+    if first < start:
+        first += timedelta(seconds=seconds)
+    last = bucket_start(end, seconds)
+    if first >= last:
+        return split_range(start, end, level - 1)
+    return split_range(start, first, level - 1) + [(model, first, last)] + split_range(last, end, level - 1)
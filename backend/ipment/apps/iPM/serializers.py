@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Dashboard, Data
+from .models import Dashboard, Data, DeleteJob
         
 class DashboardSerializer(serializers.ModelSerializer):
     class Meta:
@@ -7,6 +7,13 @@ class DashboardSerializer(serializers.ModelSerializer):
         fields = '__all__'
         
 class DataSerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source='circuit.name', read_only=True)
+
     class Meta:
         model = Data
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class DeleteJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DeleteJob
+        fields = '__all__'
@@ -0,0 +1,86 @@
+import math
+import numpy as np
+
+# Quantile sketches of the rates stored with the rollups (DDSketch-like): each rate is
+# counted in a logarithmic bucket, so two sketches merge exactly by adding their counts,
+# and any quantile read from a sketch is within RELATIVE_ACCURACY of a real sample.
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+
+# Bucket key of rates below 1 bit/s (idle circuits), read back as 0
+ZERO_KEY = 0
+
+# Stored form: (key, count) pairs sorted by key. Rates up to 2**63 bit/s need keys up to
+# about 2200, so a 16-bit key is enough.
+SKETCH_DTYPE = np.dtype([('key', '<i2'), ('count', '<u4')])
+
+
+def rate_key(rate):
+    """Return the bucket key of a rate: k holds the rates in (GAMMA**(k-2), GAMMA**(k-1)]."""
+    if rate < 1:
+        return ZERO_KEY
+    return math.ceil(math.log(rate) / LOG_GAMMA) + 1
+
+
+def key_rate(key):
+    """Return the rate standing for a bucket key, within RELATIVE_ACCURACY of any rate in it."""
+    if key == ZERO_KEY:
+        return 0.0
+    return 2 * GAMMA ** (key - 1) / (GAMMA + 1)
+
+
+def add_rate(sketch, rate):
+    """Count a rate (None is skipped) in a {key: count} sketch."""
+    if rate is not None:
+        key = rate_key(rate)
+        sketch[key] = sketch.get(key, 0) + 1
+    return sketch
+
+
+def add_rates(sketch, rates):
+    """Count an array of rates (NaN is skipped) in a {key: count} sketch at once."""
+    rates = np.asarray(rates, dtype=np.float64)
+    rates = rates[~np.isnan(rates)]
+    if not len(rates):
+        return sketch
+    keys = np.full(len(rates), ZERO_KEY, dtype=np.int64)
+    positive = rates >= 1
+    keys[positive] = np.ceil(np.log(rates[positive]) / LOG_GAMMA).astype(np.int64) + 1
+    unique_keys, counts = np.unique(keys, return_counts=True)
+    for key, count in zip(unique_keys.tolist(), counts.tolist()):
+        sketch[key] = sketch.get(key, 0) + count
+    return sketch
+
+
+def merge_sketch(sketch, data):
+    """Add a stored sketch (bytes, None is skipped) to a {key: count} sketch."""
+    if data:
+        for key, count in np.frombuffer(bytes(data), dtype=SKETCH_DTYPE).tolist():
+            sketch[key] = sketch.get(key, 0) + count
+    return sketch
+
+
+def encode_sketch(sketch):
+    """Return the stored form of a {key: count} sketch, or None when it is empty."""
+    if not sketch:
+        return None
+    return np.array(sorted(sketch.items()), dtype=SKETCH_DTYPE).tobytes()
+
+
+def sketch_quantile(sketch, q):
+    """
+    Return the `q` quantile (0 < q <= 1) of a {key: count} sketch with the nearest-rank
+    method used for 95th-percentile billing: the value with rank ceil(q * n).
+    Returns None for an empty sketch.
+    """
+    total = sum(sketch.values())
+    if not total:
+        return None
+    # The small margin keeps q * total from rounding up past an exact rank (0.95 * 100)
+    rank = max(1, math.ceil(q * total - 1e-9))
+    seen = 0
+    for key in sorted(sketch):
+        seen += sketch[key]
+        if seen >= rank:
+            return key_rate(key)
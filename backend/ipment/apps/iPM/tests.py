@@ -0,0 +1,185 @@
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+import numpy as np
+from unittest import mock
+from django.test import TransactionTestCase, override_settings
+from apps.ActivityLog.models import ActivityLog
+from apps.iPM.archive import load_day, write_day
+from apps.iPM.deletes import run_delete_job
+from apps.iPM.management.commands.archive_data import Command as ArchiveCommand
+from apps.iPM.management.commands.bir import Command as BirCommand
+from apps.iPM.models import ArchivedDay, Circuit, CircuitManager, Data, DeleteJob, IngestArchive, IngestMember
+from apps.iPM.rollups import compaction_marks
+
+CSV_CONTENT = 'MOEntity,Inbound Rate(bit/s),Outbound Rate(bit/s),Time\nR1/Gi0/1,100,200,01/01/2024 00:00:00\n'
+CSV_ROWS = ''.join(f'R1/Gi0/1,{minute},200,01/01/2024 00:{minute:02d}:00\n' for minute in range(3))
+
+
+class BirStreamRezipTests(TransactionTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.command = BirCommand()
+        self.command.stream = True
+        self.command.dead_letter_dir = os.path.join(self.directory, 'dead-letter')
+
+    def process_failing(self, file_path):
+        # Every attempt at the member fails, without the 10 s pauses between retries
+        with mock.patch.object(BirCommand, 'process_csv_member', return_value=False), \
+                mock.patch('apps.iPM.management.commands.bir.time.sleep'):
+            return self.command.process_zip(file_path)
+
+    def test_member_failing_twice_is_kept(self):
+        archive_path = os.path.join(self.directory, 'export.zip')
+        with zipfile.ZipFile(archive_path, 'w') as zip_file:
+            zip_file.writestr('export.csv', CSV_CONTENT)
+
+        # First run: the failed member is re-zipped next to the deleted archive
+        self.assertTrue(self.process_failing(archive_path))
+        rezip_path = os.path.join(self.directory, 'export.csv.zip')
+        self.assertFalse(os.path.exists(archive_path))
+        self.assertTrue(os.path.exists(rezip_path))
+
+        # Second run: the re-zip target is the archive being read
+        self.assertTrue(self.process_failing(rezip_path))
+        self.assertEqual(sorted(os.listdir(self.directory)), ['export.csv.zip'])
+        with zipfile.ZipFile(rezip_path) as zip_file:
+            self.assertEqual(zip_file.read('export.csv').decode(), CSV_CONTENT)
+
+    def test_rezipped_member_resumes_original_checkpoint(self):
+        archive_path = os.path.join(self.directory, 'export.zip')
+        with zipfile.ZipFile(archive_path, 'w') as zip_file:
+            zip_file.writestr('export.csv', CSV_CONTENT.splitlines(True)[0] + CSV_ROWS)
+        self.assertTrue(self.process_failing(archive_path))
+        original = IngestArchive.objects.get(name='export.zip')
+        # The original attempt had committed the first two rows before failing
+        IngestMember.objects.filter(archive=original, name='export.csv').update(rows_committed=2)
+
+        self.assertTrue(self.command.process_zip(os.path.join(self.directory, 'export.csv.zip')))
+        self.assertEqual(list(Data.objects.values_list('inbound_rate', flat=True)), [2])
+        self.assertTrue(IngestMember.objects.get(archive=original, name='export.csv').completed)
+        self.assertTrue(IngestArchive.objects.get(pk=original.pk).completed)
+
+
+class BirCircuitTests(TransactionTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.command = BirCommand()
+        self.command.dead_letter_dir = self.directory
+
+    def ingest(self, content):
+        self.command.ingest_csv(io.StringIO(content), 'test.csv')
+
+    def test_deleted_circuit_is_registered_again(self):
+        self.ingest(CSV_CONTENT)
+        Circuit.objects.all().delete()
+        self.ingest(CSV_CONTENT)
+        circuit = Circuit.objects.get(name='R1/Gi0/1')
+        self.assertEqual(list(Data.objects.values_list('circuit_id', flat=True)), [circuit.pk])
+
+    def test_unregistered_circuit_is_rejected(self):
+        intern = CircuitManager.intern
+        with mock.patch.object(CircuitManager, 'intern', lambda manager, names: {
+            name: circuit_id for name, circuit_id in intern(manager, names).items() if name != 'R2/Gi0/1'
+        }):
+            self.ingest(CSV_CONTENT + 'R2/Gi0/1,5,6,01/01/2024 00:00:00\n')
+        self.assertEqual(Data.objects.count(), 1)
+        self.assertEqual(self.command.csv_stats['rows_rejected'], 1)
+        [dead_letter] = os.listdir(self.directory)
+        with open(os.path.join(self.directory, dead_letter)) as rejected:
+            self.assertIn("circuit 'R2/Gi0/1' could not be registered", rejected.read())
+
+    def test_day_archived_during_csv_is_rejected(self):
+        # The day is archived after the CSV read the marks, before its batch is written
+        def archive_after_marks(*args):
+            marks = compaction_marks(*args)
+            if not ArchivedDay.objects.exists():
+                ArchivedDay.objects.create(day=date(2024, 1, 1), rows=0)
+            return marks
+        with mock.patch('apps.iPM.management.commands.bir.compaction_marks', archive_after_marks):
+            self.ingest(CSV_CONTENT)
+        self.assertEqual(Data.objects.count(), 0)
+        self.assertEqual(self.command.csv_stats['rows_rejected'], 1)
+
+
+class BirDeadLetterTests(TransactionTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.command = BirCommand()
+        self.command.dead_letter_dir = self.directory
+        archive = IngestArchive.objects.create(sha256='0' * 64, name='export.zip')
+        self.ledger_member = IngestMember.objects.create(archive=archive, name='export.csv')
+
+    def test_unwritable_dead_letter_keeps_checkpoint(self):
+        # A file where the dead-letter folder should be: the folder cannot be created
+        self.command.dead_letter_dir = os.path.join(self.directory, 'file', 'dead-letter')
+        open(os.path.join(self.directory, 'file'), 'w').close()
+        with self.assertRaises(OSError):
+            self.command.ingest_csv(io.StringIO(CSV_CONTENT + 'R1/Gi0/1,bad,6,01/01/2024 00:05:00\n'), 'export.csv', self.ledger_member)
+        self.ledger_member.refresh_from_db()
+        self.assertEqual(self.ledger_member.rows_committed, 0)
+        self.assertEqual(Data.objects.count(), 0)
+
+    def test_missing_columns_completes_member(self):
+        self.command.ingest_csv(io.StringIO('MOEntity,Time\nR1/Gi0/1,01/01/2024 00:00:00\n'), 'export.csv', self.ledger_member)
+        self.ledger_member.refresh_from_db()
+        self.assertTrue(self.ledger_member.completed)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+
+class ArchiveDayTests(TransactionTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        settings_override = override_settings(IPM_ARCHIVE_DIR=directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.circuit = Circuit.objects.create(name='R1/Gi0/1')
+        self.day = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+    def test_rows_inserted_while_archiving_are_kept(self):
+        for minute in range(3):
+            Data.objects.create(circuit=self.circuit, time=self.day + timedelta(minutes=minute), inbound_rate=minute, outbound_rate=None)
+
+        def write_day_then_insert(day, array):
+            # A sample added after the day was read, before its rows are deleted
+            Data.objects.create(circuit=self.circuit, time=self.day + timedelta(minutes=10), inbound_rate=10, outbound_rate=10)
+            write_day(day, array)
+
+        with mock.patch('apps.iPM.management.commands.archive_data.write_day', write_day_then_insert):
+            self.assertEqual(ArchiveCommand().archive_day(self.day, self.day + timedelta(days=1), 2), 3)
+        self.assertEqual(list(Data.objects.values_list('inbound_rate', flat=True)), [10])
+        array = load_day(date(2024, 1, 1))
+        self.assertEqual(array['inbound'].tolist(), [0, 1, 2])
+        # Missing rates are archived as NaN, not as 0
+        self.assertTrue(np.isnan(array['outbound']).all())
+
+
+class DeleteJobTests(TransactionTestCase):
+    def setUp(self):
+        circuit = Circuit.objects.create(name='R1/Gi0/1')
+        day = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        for minute in range(3):
+            Data.objects.create(circuit=circuit, time=day + timedelta(minutes=minute), inbound_rate=minute, outbound_rate=minute)
+        self.job = DeleteJob.objects.create(filters={'circuit': 'R1/Gi0/1'}, total=3)
+
+    def test_concurrent_runners_keep_the_counts(self):
+        runs = []
+
+        def run_again_after_first_chunk(message):
+            # Another runner (e.g. `run_delete_jobs` after a restart) finishes the job meanwhile
+            if not runs:
+                runs.append(run_delete_job(self.job.pk, 1))
+
+        with mock.patch('apps.iPM.deletes.logger.info', run_again_after_first_chunk):
+            job = run_delete_job(self.job.pk, 1)
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.deleted, 3)
+        self.assertEqual(sum(count for _, _, count in job.id_ranges), 3)
+        self.assertEqual(ActivityLog.objects.filter(model='Data', record_id=self.job.pk).count(), 1)
@@ -7,5 +7,5 @@ urlpatterns = [
     url(r'^view/dashboard/(?P<id>[0-9]+)$', DashboardView.dashboardApi),
     
     # Data URLS
-    url(r'^(?P<method>list|list-top|list-circuit|delete)/data/$', DataView.dataApi)
+    url(r'^(?P<method>list|list-top|list-latest|list-circuit|series|percentile|delete|delete-status)/data/$', DataView.dataApi)
 ]
\ No newline at end of file
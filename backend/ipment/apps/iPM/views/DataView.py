@@ -1,74 +1,200 @@
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.parsers import JSONParser
 from django.http.response import JsonResponse
-from django.http import HttpResponseBadRequest
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
 from rest_framework.decorators import permission_classes
 from rest_framework.permissions import IsAuthenticated
-from apps.iPM.models import Data, Dashboard
-from apps.iPM.serializers import DataSerializer
+from apps.iPM.archive import archived_days_between, read_range
+from apps.iPM.deletes import start_delete_job
+from apps.iPM.downsample import METHODS as DOWNSAMPLE_METHODS, lttb_indices, minmax_buckets
+from apps.iPM.latest import latest_sample_time, refresh_latest
+from apps.iPM.models import Circuit, CircuitLatest, Data, Dashboard, DeleteJob
+from apps.iPM.rollups import bucket_start, pick_resolution, range_segments, update_rollups
+from apps.iPM.serializers import DeleteJobSerializer
+from apps.iPM.sketches import add_rate, add_rates, merge_sketch, sketch_quantile
 from apps.ActivityLog.models import ActivityLog
 from django.contrib.auth.models import Group
 from apps.UserAccount.models import UserProfile
-from apps.Configuration.models import MeasurementUnit, Label
+from apps.Configuration import cache as configuration
+from ipment.pagination import after_key, page_params, page_response
 from django.utils.dateparse import parse_datetime
-from django.db.models import Avg, Q
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q, Sum
+from rest_framework.fields import DateTimeField
+from django.core.serializers.json import DjangoJSONEncoder
+from itertools import islice
+from datetime import datetime, timezone
+import numpy as np
+import heapq
 import json
 
+# Rows read from the database, and items written to a streamed response, at a time
+STREAM_CHUNK_SIZE = 2000
+
+# Key of the 'list' pages: Data rows follow the time index, ties are ordered by id
+DATA_CURSOR_FIELDS = ('time', 'id')
+
+
+# Divisors converting a rate in bit/s into each measurement unit
+UNIT_DIVISORS = {
+    'bit': 1,
+    'kilobit': 1000,
+    'megabit': 10 ** 6,
+    'byte': 8,
+    'kilobyte': 8 * 10 ** 3,
+    'megabyte': 8 * 10 ** 6,
+}
+
 
 def convert_rate(rate, unit):
-    """Helper function to convert rate based on measurement unit."""
-    if unit == 'bit':
-        return rate
-    elif unit == 'kilobit':
-        return rate / 1000
-    elif unit == 'megabit':
-        return rate / (10 ** 6)
-    elif unit == 'byte':
-        return rate / 8
-    elif unit == 'kilobyte':
-        return rate / (8 * 10 ** 3)
-    elif unit == 'megabyte':
-        return rate / (8 * 10 ** 6)
-    else:
-        return rate  # Default to bit if the unit is unrecognized
+    """Helper function to convert rate (a number or a NumPy array) based on measurement unit."""
+    divisor = UNIT_DIVISORS.get(unit, 1)  # Default to bit if the unit is unrecognized
+    return rate if divisor == 1 else rate / divisor
+
+
+def convert_rate_column(rates, unit, integral=False):
+    """
+    Helper function to convert a whole column of rates based on measurement unit and round
+    them to 3 decimal places at once. With `integral` (whole bit/s: Data rows, or archived rows
+    held as doubles), rates in bits are returned as integers. Missing rates stay None.
+    """
+    if integral and UNIT_DIVISORS.get(unit, 1) == 1:
+        if isinstance(rates, np.ndarray):
+            return rate_values(rates.astype(np.float64), whole=True)
+        return list(rates)
+    column = np.array(rates, dtype=np.float64)  # None becomes NaN
+    converted = np.round(convert_rate(column, unit), 3).tolist()
+    if np.isnan(column).any():
+        converted = [None if value != value else value for value in converted]
+    return converted
+
+
+def rate_values(column, whole=False):
+    """Helper function to return a column of rates as a list, NaN as None and, with `whole`, as integers."""
+    missing = np.isnan(column)
+    if not missing.any():
+        return column.astype(np.int64).tolist() if whole else column.tolist()
+    return [None if is_missing else (int(value) if whole else value) for value, is_missing in zip(column.tolist(), missing.tolist())]
+
+
+def format_epoch_seconds(seconds):
+    """Helper function to format a column of epoch seconds like DRF's DateTimeField (UTC, 'Z' suffix)."""
+    return np.datetime_as_string(np.asarray(seconds, dtype=np.int64).astype('datetime64[s]'), timezone='UTC').tolist()
+
+
+def format_datetimes(values):
+    """
+    Helper function to format a column of datetimes like DRF's DateTimeField, at once.
+    Sample times are whole seconds; a column with microseconds goes through DateTimeField.
+    """
+    seconds = np.array([value.timestamp() for value in values])
+    if (seconds % 1).any():
+        time_field = DateTimeField()
+        return [time_field.to_representation(value) for value in values]
+    return format_epoch_seconds(seconds)
+
+
+def circuit_labels(circuit_ids, labels):
+    """
+    Helper function to add the labels (or names, when they have none) of circuits not seen
+    yet to a {circuit id: label} dict, with one query for their names.
+    """
+    missing = set(circuit_ids).difference(labels)
+    if missing:
+        names = dict(Circuit.objects.filter(id__in=missing).values_list('id', 'name'))
+        for circuit_id in missing:
+            labels[circuit_id] = get_label_for_circuit(names.get(circuit_id))
+    return labels
+
+
+def list_items(ids, circuit_ids, times, inbound_rates, outbound_rates, labels, measurement_unit, integral=False):
+    """
+    Helper function to build the 'list' items of a chunk of rows given as columns (`times`
+    already formatted). Rates are converted column by column; only the items are built per row.
+    """
+    circuit_labels(circuit_ids, labels)
+    return [
+        {'id': data_id, 'name': labels[circuit_id], 'inbound_rate': inbound_rate, 'outbound_rate': outbound_rate, 'time': time_value}
+        for data_id, circuit_id, inbound_rate, outbound_rate, time_value in zip(
+            ids,
+            circuit_ids,
+            convert_rate_column(inbound_rates, measurement_unit, integral),
+            convert_rate_column(outbound_rates, measurement_unit, integral),
+            times
+        )
+    ]
+
+
+def data_rows_items(rows, labels, measurement_unit):
+    """Helper function to build the 'list' items of (id, circuit id, time, inbound, outbound) Data rows."""
+    if not rows:
+        return []
+    ids, circuit_ids, times, inbound_rates, outbound_rates = zip(*rows)
+    return list_items(ids, circuit_ids, format_datetimes(times), inbound_rates, outbound_rates, labels, measurement_unit, integral=True)
+
+
+def rollup_rows_items(rows, labels, measurement_unit):
+    """
+    Helper function to build the 'list' items of (circuit id, bucket, count, inbound sum,
+    outbound sum) rollup rows: each bucket is returned as one sample holding its average rates.
+    """
+    if not rows:
+        return []
+    circuit_ids, buckets, counts, inbound_sums, outbound_sums = zip(*rows)
+    counts = np.array(counts, dtype=np.float64)
+    return list_items(
+        [None] * len(rows),
+        circuit_ids,
+        format_datetimes(buckets),
+        np.array(inbound_sums, dtype=np.float64) / counts,
+        np.array(outbound_sums, dtype=np.float64) / counts,
+        labels,
+        measurement_unit
+    )
+
+
+def archived_rows_items(archived, labels, measurement_unit):
+    """Helper function to build the 'list' items of an archive array (see apps/iPM/archive.py)."""
+    return list_items(
+        [None] * len(archived),
+        archived['circuit'].tolist(),
+        format_epoch_seconds(archived['time']),
+        archived['inbound'],
+        archived['outbound'],
+        labels,
+        measurement_unit,
+        integral=True
+    )
 
 
 def get_measurement_unit():
     """Helper function to get measurement unit with id=1. Defaults to 'bit' if not found."""
-    try:
-        measurement_unit = MeasurementUnit.objects.get(id=1)
-        return measurement_unit.unit
-    except MeasurementUnit.DoesNotExist:
-        print("Warning: MeasurementUnit with id=1 not found. Defaulting to 'bit'.")
-        return 'bit'  # Default to 'bit' if the record does not exist
+    return configuration.measurement_unit()
 
 
 def get_label_for_circuit(name):
     """Helper function to find label for a given circuit name."""
-    try:
-        label = Label.objects.get(circuit=name)
-        return label.label
-    except Label.DoesNotExist:
-        return name  # Return the original name if no label is found
+    return configuration.label_for_circuit(name)  # The original name if no label is found
 
 
 def get_circuit_from_label_or_name(circuit_or_label):
     """Helper function to get the 'name' (circuit) from either a given label or name."""
-    try:
-        # Check if the parameter is a label, and get the corresponding 'circuit' (name)
-        label = Label.objects.get(label=circuit_or_label)
-        return label.circuit
-    except Label.DoesNotExist:
-        # If it's not a label, treat it as the circuit (name)
-        return circuit_or_label
+    return configuration.circuit_for_label_or_name(circuit_or_label)
+
 
+def circuits_matching(name):
+    """Helper function to get a subquery of the circuit ids whose name contains the given text."""
+    return Circuit.objects.filter(name__icontains=name).values('id')
 
-def filter_queryset_for_user(user, data_queryset):
+
+def filter_queryset_for_user(user, data_queryset, circuit_field='circuit'):
     """
     Helper function to filter the queryset based on user permissions.
     - If user is superuser or in the 'Administrator' group, return all data.
     - Otherwise, filter data based on the dashboards connected to the user.
+    The dashboard names are matched against the Circuit registry once, and the queryset is
+    filtered on `circuit_field` (use 'id' for a Circuit queryset).
     """
     if user.is_superuser or user.groups.filter(name='Administrator').exists():
         return data_queryset  # User can see all records
@@ -88,11 +214,255 @@ def filter_queryset_for_user(user, data_queryset):
             query = Q()
             for name in data_names:
                 query |= Q(name__icontains=name)
-            
-            return data_queryset.filter(query)
+
+            circuit_ids = Circuit.objects.filter(query).values('id')
+            return data_queryset.filter(**{f'{circuit_field}__in': circuit_ids})
 
         except UserProfile.DoesNotExist:
-            return Data.objects.none()  # If user profile is missing, return no records
+            return data_queryset.none()  # If user profile is missing, return no records
+
+
+def archived_rows(user, start_date, end_date, circuit=None, end_inclusive=True):
+    """
+    Helper function to read the rows of archived days between two dates from the cold archive,
+    filtered like the Data querysets (circuit name and user permissions).
+    Returns an archive array (see apps/iPM/archive.py), or None if no archived day overlaps the range.
+    """
+    if not (start_date and end_date) or not archived_days_between(start_date, end_date):
+        return None
+    circuit_queryset = Circuit.objects.all()
+    if circuit:
+        circuit_queryset = circuit_queryset.filter(id__in=circuits_matching(circuit))
+    circuit_ids = set(filter_queryset_for_user(user, circuit_queryset, circuit_field='id').values_list('id', flat=True))
+    return read_range(start_date, end_date, circuit_ids, end_inclusive)
+
+
+def average_rates_by_circuit(user, start_date, end_date):
+    """
+    Helper function to compute the average rates of every circuit between two dates.
+    The middle of the range is read from the coarsest rollups that fit in it and only its
+    ends from raw Data rows (see apps/iPM/rollups.py), which gives the raw averages.
+    Returns a {circuit id: (avg inbound rate, avg outbound rate)} dict.
+    """
+    if start_date and end_date:
+        segments = range_segments(start_date, end_date)
+    else:
+        segments = [(Data, None, None)]  # No data yet, or no dates: everything
+
+    totals = {}
+    for model, lo, hi in segments:
+        if model is Data:
+            queryset = Data.objects.all()
+            if lo is not None:
+                queryset = queryset.filter(time__gte=lo, time__lt=hi)
+            queryset = filter_queryset_for_user(user, queryset).values('circuit').annotate(
+                samples=Count('id'),
+                inbound_total=Sum('inbound_rate'),
+                outbound_total=Sum('outbound_rate')
+            )
+
+            # Raw rows of archived days come from the cold archive
+            archived = archived_rows(user, lo, hi, end_inclusive=False) if lo is not None else None
+            if archived is not None and len(archived):
+                circuit_ids, inverse = np.unique(archived['circuit'], return_inverse=True)
+                samples = np.bincount(inverse)
+                # Missing rates add nothing to the sums but count as samples, like SUM and COUNT above
+                inbound_totals = np.bincount(inverse, weights=np.nan_to_num(archived['inbound']))
+                outbound_totals = np.bincount(inverse, weights=np.nan_to_num(archived['outbound']))
+                for circuit_id, count, inbound_total, outbound_total in zip(
+                    circuit_ids.tolist(), samples.tolist(), inbound_totals.tolist(), outbound_totals.tolist()
+                ):
+                    total = totals.setdefault(circuit_id, [0, 0.0, 0.0])
+                    total[0] += count
+                    total[1] += inbound_total
+                    total[2] += outbound_total
+        else:
+            queryset = filter_queryset_for_user(user, model.objects.filter(bucket__gte=lo, bucket__lt=hi))
+            queryset = queryset.values('circuit').annotate(
+                samples=Sum('count'),
+                inbound_total=Sum('inbound_sum'),
+                outbound_total=Sum('outbound_sum')
+            )
+        for item in queryset:
+            total = totals.setdefault(item['circuit'], [0, 0.0, 0.0])
+            total[0] += item['samples'] or 0
+            total[1] += item['inbound_total'] or 0
+            total[2] += item['outbound_total'] or 0
+
+    return {
+        circuit_id: (inbound_total / samples, outbound_total / samples)
+        for circuit_id, (samples, inbound_total, outbound_total) in totals.items() if samples
+    }
+
+
+def rate_sketches_by_circuit(user, start_date, end_date, circuit=None):
+    """
+    Helper function to build the quantile sketches of the rates of every circuit between two
+    dates, merging the sketches stored with the rollups over the same segments as
+    average_rates_by_circuit and adding the raw rates at the ends of the range.
+    Returns a {circuit id: (inbound sketch, outbound sketch)} dict.
+    """
+    sketches = {}
+    for model, lo, hi in range_segments(start_date, end_date):
+        if model is Data:
+            queryset = Data.objects.filter(time__gte=lo, time__lt=hi)
+            rates = 'inbound_rate', 'outbound_rate'
+            add = add_rate
+        else:
+            queryset = model.objects.filter(bucket__gte=lo, bucket__lt=hi)
+            rates = 'inbound_sketch', 'outbound_sketch'
+            add = merge_sketch
+        if circuit:
+            queryset = queryset.filter(circuit__in=circuits_matching(circuit))
+        queryset = filter_queryset_for_user(user, queryset)
+        for circuit_id, inbound, outbound in queryset.values_list('circuit_id', *rates).iterator():
+            inbound_sketch, outbound_sketch = sketches.setdefault(circuit_id, ({}, {}))
+            add(inbound_sketch, inbound)
+            add(outbound_sketch, outbound)
+
+        # Raw rows of archived days come from the cold archive
+        archived = archived_rows(user, lo, hi, circuit, end_inclusive=False) if model is Data else None
+        if archived is not None and len(archived):
+            # Group the rows by circuit (the array is sorted by circuit within each day)
+            archived = archived[np.argsort(archived['circuit'], kind='stable')]
+            circuit_ids, starts = np.unique(archived['circuit'], return_index=True)
+            for circuit_id, part in zip(circuit_ids.tolist(), np.split(archived, starts[1:])):
+                inbound_sketch, outbound_sketch = sketches.setdefault(circuit_id, ({}, {}))
+                add_rates(inbound_sketch, part['inbound'])
+                add_rates(outbound_sketch, part['outbound'])
+    return sketches
+
+
+def json_array_response(items):
+    """
+    Helper function to stream an iterable of items as a JSON array, STREAM_CHUNK_SIZE items
+    per written chunk, so that neither the rows nor the JSON document are held in memory.
+    """
+    items = iter(items)
+
+    def chunks():
+        yield '['
+        separator = ''
+        while True:
+            chunk = list(islice(items, STREAM_CHUNK_SIZE))
+            if not chunk:
+                break
+            yield separator + json.dumps(chunk, cls=DjangoJSONEncoder)[1:-1]
+            separator = ', '
+        yield ']'
+
+    return StreamingHttpResponse(chunks(), content_type='application/json')
+
+
+def downsampled_results(ids, circuit_ids, times, rates, max_points, method, measurement_unit):
+    """
+    Helper function to downsample each circuit's series to at most `max_points` samples and
+    build the 'list' results. `ids` (-1 when there is none), `circuit_ids` and `times` (seconds
+    since the epoch) are (n,) arrays and `rates` an (n, 2) array of inbound and outbound rates.
+    With 'lttb' the kept rows are real samples; with 'minmax' each row is a time bucket holding
+    the average rates, plus their min and max in the bucket.
+    """
+    order = np.lexsort((times, circuit_ids))
+    ids, circuit_ids, times, rates = ids[order], circuit_ids[order], times[order], rates[order]
+    unique_circuit_ids, starts = np.unique(circuit_ids, return_index=True)
+    ends = np.append(starts[1:], len(times))
+
+    parts = []
+    for circuit_id, start, end in zip(unique_circuit_ids.tolist(), starts.tolist(), ends.tolist()):
+        series_times, series_rates = times[start:end], rates[start:end]
+        if method == 'lttb':
+            kept = lttb_indices(series_times, series_rates, max_points)
+            parts.append((ids[start:end][kept], circuit_id, series_times[kept], series_rates[kept], None, None))
+        else:
+            bucket_times, averages, minimums, maximums = minmax_buckets(series_times, series_rates, max_points)
+            parts.append((np.full(len(bucket_times), -1), circuit_id, bucket_times, averages, minimums, maximums))
+
+    labels = circuit_labels(unique_circuit_ids.tolist(), {})
+    results = []
+    for part_ids, circuit_id, part_times, averages, minimums, maximums in parts:
+        name = labels[circuit_id]
+        part_times = format_epoch_seconds(part_times)
+        averages = np.round(convert_rate(averages, measurement_unit), 3).tolist()
+        if minimums is not None:
+            minimums = np.round(convert_rate(minimums, measurement_unit), 3).tolist()
+            maximums = np.round(convert_rate(maximums, measurement_unit), 3).tolist()
+        for index, (data_id, time_value) in enumerate(zip(part_ids.tolist(), part_times)):
+            item = {
+                'id': data_id if data_id >= 0 else None,
+                'name': name,
+                'inbound_rate': averages[index][0],
+                'outbound_rate': averages[index][1],
+                'time': time_value,
+            }
+            if minimums is not None:
+                item.update({
+                    'inbound_min': minimums[index][0],
+                    'inbound_max': maximums[index][0],
+                    'outbound_min': minimums[index][1],
+                    'outbound_max': maximums[index][1],
+                })
+            results.append(item)
+    results.sort(key=lambda item: item['time'])
+    return results
+
+
+def series_blocks(circuits, circuit_ids, times, rates, measurement_unit, integral=False):
+    """
+    Helper function to build the 'series' blocks: one per circuit of the (id, name) pairs of
+    `circuits`, in that order, holding its times (seconds since the epoch) and rates as columns.
+    `circuit_ids` and `times` are (n,) arrays and `rates` an (n, 2) array of inbound and outbound
+    rates (NaN when missing). With `integral` (Data rows), rates in bits are returned as integers.
+    """
+    order = np.lexsort((times, circuit_ids))
+    circuit_ids, times, rates = circuit_ids[order], times[order], rates[order]
+    rates = np.round(convert_rate(rates, measurement_unit), 3)
+    whole = integral and UNIT_DIVISORS.get(measurement_unit, 1) == 1
+    starts = np.searchsorted(circuit_ids, [circuit_id for circuit_id, _ in circuits], side='left')
+    ends = np.searchsorted(circuit_ids, [circuit_id for circuit_id, _ in circuits], side='right')
+    return [
+        {
+            'name': get_label_for_circuit(name),
+            't': times[start:end].tolist(),
+            'in': rate_values(rates[start:end, 0], whole),
+            'out': rate_values(rates[start:end, 1], whole),
+        }
+        for (_, name), start, end in zip(circuits, starts.tolist(), ends.tolist())
+    ]
+
+
+def data_page(user, data_queryset, start_date, end_date, circuit_or_label, page, measurement_unit):
+    """
+    Helper function to read one 'list' page of Data rows, with the rows of archived days
+    from the cold archive, after the (time, id) key of the page. Archived rows have no id:
+    ties are ordered by circuit id, which the key holds instead (a time is either in Data
+    or in the archive, never both). Returns (items, key of the next page or None).
+    """
+    limit, key = page
+    labels = {}
+    rows = list(after_key(
+        data_queryset.values_list('id', 'circuit_id', 'time', 'inbound_rate', 'outbound_rate'), key, DATA_CURSOR_FIELDS
+    )[:limit + 1])
+    data_items = zip([(row[2], row[0]) for row in rows], data_rows_items(rows, labels, measurement_unit))
+
+    # Only the archived days from the key on are read
+    circuit = get_circuit_from_label_or_name(circuit_or_label) if circuit_or_label else None
+    archive_start = max(start_date, key[0]) if key and start_date else start_date
+    archived = archived_rows(user, archive_start, end_date, circuit)
+    archived_items = []
+    if archived is not None and len(archived):
+        if key:
+            seconds = key[0].timestamp()
+            archived = archived[(archived['time'] > seconds) | ((archived['time'] == seconds) & (archived['circuit'] > key[1]))]
+        archived = archived[np.lexsort((archived['circuit'], archived['time']))][:limit + 1]
+        archived_keys = [
+            (datetime.fromtimestamp(seconds, tz=timezone.utc), circuit_id)
+            for seconds, circuit_id in zip(archived['time'].tolist(), archived['circuit'].tolist())
+        ]
+        archived_items = zip(archived_keys, archived_rows_items(archived, labels, measurement_unit))
+
+    merged = list(islice(heapq.merge(data_items, archived_items, key=lambda pair: pair[0]), limit + 1))
+    next_key = merged[limit - 1][0] if len(merged) > limit else None
+    return [item for _, item in merged[:limit]], next_key
 
 
 @login_required
@@ -102,7 +472,7 @@ def dataApi(request, method=None):
     API view to handle Data listing and deletion.
     """
 
-    if method not in ['list', 'list-top', 'list-circuit', 'delete']:
+    if method not in ['list', 'list-top', 'list-latest', 'list-circuit', 'series', 'percentile', 'delete', 'delete-status']:
         return HttpResponseBadRequest("Invalid request method.")
 
     user = request.user
@@ -110,11 +480,12 @@ def dataApi(request, method=None):
     # Handle the 'list-circuit' method
     if method == 'list-circuit':
         if request.method == 'GET':
-            # Get all unique name fields from Data model
-            data_queryset = Data.objects.values_list('name', flat=True).distinct()
+            # Get the names of all circuits that have data
+            circuit_queryset = Circuit.objects.filter(Exists(Data.objects.filter(circuit=OuterRef('pk'))))
 
             # Filter queryset based on user permissions
-            data_queryset = filter_queryset_for_user(user, data_queryset)
+            circuit_queryset = filter_queryset_for_user(user, circuit_queryset, circuit_field='id')
+            data_queryset = circuit_queryset.values_list('name', flat=True)
 
             # Optionally, you can replace the circuit names with labels from the Label model
             circuits_with_labels = [get_label_for_circuit(name) for name in data_queryset]
@@ -131,21 +502,123 @@ def dataApi(request, method=None):
             start_date = request.GET.get('start_date')
             end_date = request.GET.get('end_date')
             circuit_or_label = request.GET.get('circuit')
-
-            # Apply default values
-            latest_time = Data.objects.latest('time').time if Data.objects.exists() else None
-            if not start_date:
-                start_date = latest_time
-            if not end_date:
-                end_date = latest_time
+            points = request.GET.get('points')
+            max_points = request.GET.get('max_points')
+            downsample = request.GET.get('downsample', 'lttb')
 
             # Convert start_date and end_date to datetime objects
             try:
-                start_date = parse_datetime(start_date)
-                end_date = parse_datetime(end_date)
+                start_date = parse_datetime(start_date) if start_date else None
+                end_date = parse_datetime(end_date) if end_date else None
             except:
                 return JsonResponse("Invalid date format.", status=400, safe=False)
 
+            # Apply default values: the time of the newest sample
+            if not start_date or not end_date:
+                latest_time = latest_sample_time()
+                start_date = start_date or latest_time
+                end_date = end_date or latest_time
+
+            # With 'points', read the coarsest rollup still giving that many points per circuit;
+            # ranges older than the raw samples kept by `compact_data` are read from rollups too
+            rollup = None
+            if points:
+                try:
+                    points = int(points)
+                    if points < 1:
+                        raise ValueError
+                except ValueError:
+                    return JsonResponse(
+                        "Invalid 'points' parameter. Must be a positive integer.",
+                        status=400,
+                        safe=False
+                    )
+            if start_date and end_date:
+                rollup = pick_resolution(start_date, end_date, points)
+
+            # With 'max_points', each circuit's series is downsampled to at most that many points
+            if max_points:
+                try:
+                    max_points = int(max_points)
+                    if max_points < 1:
+                        raise ValueError
+                except ValueError:
+                    return JsonResponse(
+                        "Invalid 'max_points' parameter. Must be a positive integer.",
+                        status=400,
+                        safe=False
+                    )
+            if downsample not in DOWNSAMPLE_METHODS:
+                return JsonResponse(
+                    f"Invalid 'downsample' parameter. Must be one of {', '.join(DOWNSAMPLE_METHODS)}.",
+                    status=400,
+                    safe=False
+                )
+
+            # With 'limit' or 'cursor', return one page of the series (see ipment/pagination.py)
+            page = page_params(request, DATA_CURSOR_FIELDS)
+            if isinstance(page, str):
+                return JsonResponse(page, status=400, safe=False)
+            if page is not None and max_points:
+                return JsonResponse("'max_points' cannot be combined with 'limit' or 'cursor'.", status=400, safe=False)
+
+            if rollup is not None:
+                _, seconds, rollup_model = rollup
+                rollup_queryset = rollup_model.objects.filter(
+                    bucket__gte=bucket_start(start_date, seconds),
+                    bucket__lte=end_date
+                )
+                if circuit_or_label:
+                    circuit = get_circuit_from_label_or_name(circuit_or_label)
+                    rollup_queryset = rollup_queryset.filter(circuit__in=circuits_matching(circuit))
+                rollup_queryset = filter_queryset_for_user(user, rollup_queryset)
+                measurement_unit = get_measurement_unit()
+
+                if page is not None:
+                    # Pages of buckets follow the bucket index, ties are ordered by id
+                    limit, key = page
+                    rows = list(after_key(
+                        rollup_queryset.values_list('circuit_id', 'bucket', 'count', 'inbound_sum', 'outbound_sum', 'id'),
+                        key,
+                        ('bucket', 'id')
+                    )[:limit + 1])
+                    next_key = (rows[limit - 1][1], rows[limit - 1][5]) if len(rows) > limit else None
+                    return page_response(rollup_rows_items([row[:5] for row in rows[:limit]], {}, measurement_unit), next_key)
+
+                if max_points:
+                    rows = list(rollup_queryset.values_list('circuit_id', 'bucket', 'count', 'inbound_sum', 'outbound_sum'))
+                    if not rows:
+                        return JsonResponse([], safe=False)
+                    circuit_ids, buckets, counts, inbound_sums, outbound_sums = zip(*rows)
+                    counts = np.array(counts, dtype=np.float64)
+                    rates = np.column_stack([
+                        np.array(inbound_sums, dtype=np.float64) / counts,
+                        np.array(outbound_sums, dtype=np.float64) / counts,
+                    ])
+                    return JsonResponse(downsampled_results(
+                        np.full(len(rows), -1),
+                        np.array(circuit_ids),
+                        np.array([bucket.timestamp() for bucket in buckets]),
+                        np.nan_to_num(rates),
+                        max_points,
+                        downsample,
+                        measurement_unit
+                    ), safe=False)
+
+                rows = rollup_queryset.order_by('bucket').values_list(
+                    'circuit_id', 'bucket', 'count', 'inbound_sum', 'outbound_sum'
+                ).iterator(chunk_size=STREAM_CHUNK_SIZE)
+                labels = {}
+
+                def rollup_items():
+                    while True:
+                        chunk = list(islice(rows, STREAM_CHUNK_SIZE))
+                        if not chunk:
+                            return
+                        yield from rollup_rows_items(chunk, labels, measurement_unit)
+
+                return json_array_response(rollup_items())
+
             # Filter Data objects
             data_queryset = Data.objects.all()
             if start_date and end_date:
@@ -154,7 +627,7 @@ def dataApi(request, method=None):
             if circuit_or_label:
                 # If circuit_or_label is provided, get the corresponding circuit (name)
                 circuit = get_circuit_from_label_or_name(circuit_or_label)
-                data_queryset = data_queryset.filter(name__icontains=circuit)
+                data_queryset = data_queryset.filter(circuit__in=circuits_matching(circuit))
 
             # Filter queryset based on user permissions
             data_queryset = filter_queryset_for_user(user, data_queryset)
@@ -162,33 +635,140 @@ def dataApi(request, method=None):
             # Get the measurement unit and apply rate conversion if necessary
             measurement_unit = get_measurement_unit()
 
-            # Annotate and aggregate data
-            data_queryset = data_queryset.order_by('time')
-            dataSerializer = DataSerializer(data_queryset, many=True)
+            if max_points:
+                # Read the rows as columns, with the ones of archived days from the cold archive
+                rows = list(data_queryset.values_list('id', 'circuit_id', 'time', 'inbound_rate', 'outbound_rate'))
+                ids = np.array([row[0] for row in rows], dtype=np.int64)
+                circuit_ids = np.array([row[1] for row in rows], dtype=np.int64)
+                times = np.array([row[2].timestamp() for row in rows], dtype=np.float64)
+                rates = np.array([(row[3] or 0, row[4] or 0) for row in rows], dtype=np.float64).reshape(-1, 2)
+                circuit = get_circuit_from_label_or_name(circuit_or_label) if circuit_or_label else None
+                archived = archived_rows(user, start_date, end_date, circuit)
+                if archived is not None and len(archived):
+                    ids = np.concatenate([ids, np.full(len(archived), -1)])
+                    circuit_ids = np.concatenate([circuit_ids, archived['circuit']])
+                    times = np.concatenate([times, archived['time'].astype(np.float64)])
+                    rates = np.concatenate([rates, np.nan_to_num(np.column_stack([archived['inbound'], archived['outbound']]))])
+                if not len(times):
+                    return JsonResponse([], safe=False)
+                return JsonResponse(
+                    downsampled_results(ids, circuit_ids, times, rates, max_points, downsample, measurement_unit),
+                    safe=False
+                )
+
+            if page is not None:
+                return page_response(*data_page(user, data_queryset, start_date, end_date, circuit_or_label, page, measurement_unit))
 
-            results = []
-            for item in dataSerializer.data:
-                # Convert the rates based on measurement unit
-                inbound_rate = convert_rate(float(item['inbound_rate']), measurement_unit)
-                outbound_rate = convert_rate(float(item['outbound_rate']), measurement_unit)
+            # Read the rows as plain tuples, a chunk at a time as the response is sent
+            rows = data_queryset.order_by('time').values_list(
+                'id', 'circuit_id', 'time', 'inbound_rate', 'outbound_rate'
+            ).iterator(chunk_size=STREAM_CHUNK_SIZE)
+            labels = {}
 
-                # Round the rates to 3 decimal places
-                inbound_rate = round(inbound_rate, 3)
-                outbound_rate = round(outbound_rate, 3)
+            def data_items():
+                while True:
+                    chunk = list(islice(rows, STREAM_CHUNK_SIZE))
+                    if not chunk:
+                        return
+                    yield from data_rows_items(chunk, labels, measurement_unit)
 
-                # Map the name to the label from Label model
-                name = get_label_for_circuit(item['name'])
+            # Add the rows of archived days, read from the cold archive
+            circuit = get_circuit_from_label_or_name(circuit_or_label) if circuit_or_label else None
+            archived = archived_rows(user, start_date, end_date, circuit)
+            if archived is None or not len(archived):
+                return json_array_response(data_items())
 
-                # Append the modified data to the results
-                results.append({
-                    'id': item['id'],
-                    'name': name,
-                    'inbound_rate': inbound_rate,
-                    'outbound_rate': outbound_rate,
-                    'time': item['time'],
-                })
+            archived = archived[np.argsort(archived['time'], kind='stable')]
 
-            return JsonResponse(results, safe=False)
+            def archived_items():
+                for start in range(0, len(archived), STREAM_CHUNK_SIZE):
+                    yield from archived_rows_items(archived[start:start + STREAM_CHUNK_SIZE], labels, measurement_unit)
+
+            # Both streams are sorted by time, merge them as they are sent
+            return json_array_response(heapq.merge(data_items(), archived_items(), key=lambda item: item['time']))
+
+    # Handle the 'series' method
+    elif method == 'series':
+        if request.method == 'GET':
+            # Get parameters: one 'circuit' parameter (circuit or label) per circuit
+            start_date = request.GET.get('start_date')
+            end_date = request.GET.get('end_date')
+            circuits_or_labels = [value for value in request.GET.getlist('circuit') if value]
+            points = request.GET.get('points')
+
+            if not circuits_or_labels:
+                return JsonResponse("Missing 'circuit' parameter.", status=400, safe=False)
+
+            # Convert start_date and end_date to datetime objects
+            try:
+                start_date = parse_datetime(start_date) if start_date else None
+                end_date = parse_datetime(end_date) if end_date else None
+            except:
+                return JsonResponse("Invalid date format.", status=400, safe=False)
+
+            # Apply default values: the time of the newest sample
+            if not start_date or not end_date:
+                latest_time = latest_sample_time()
+                start_date = start_date or latest_time
+                end_date = end_date or latest_time
+            if not start_date or not end_date:
+                return JsonResponse([], safe=False)
+
+            if points:
+                try:
+                    points = int(points)
+                    if points < 1:
+                        raise ValueError
+                except ValueError:
+                    return JsonResponse(
+                        "Invalid 'points' parameter. Must be a positive integer.",
+                        status=400,
+                        safe=False
+                    )
+
+            # The requested circuits the user may see, in the order they were asked for
+            circuit_names = list(dict.fromkeys(get_circuit_from_label_or_name(value) for value in circuits_or_labels))
+            circuit_queryset = filter_queryset_for_user(user, Circuit.objects.filter(name__in=circuit_names), circuit_field='id')
+            circuit_ids = dict(circuit_queryset.values_list('name', 'id'))
+            circuits = [(circuit_ids[name], name) for name in circuit_names if name in circuit_ids]
+            if not circuits:
+                return JsonResponse([], safe=False)
+            measurement_unit = get_measurement_unit()
+
+            # One query for all circuits, read in (circuit, time) order on the unique index;
+            # with 'points', from the coarsest rollup still giving that many points per circuit
+            rollup = pick_resolution(start_date, end_date, points)
+            if rollup is not None:
+                _, seconds, rollup_model = rollup
+                rows = list(rollup_model.objects.filter(
+                    circuit_id__in=[circuit_id for circuit_id, _ in circuits],
+                    bucket__gte=bucket_start(start_date, seconds),
+                    bucket__lte=end_date
+                ).order_by('circuit_id', 'bucket').values_list('circuit_id', 'bucket', 'count', 'inbound_sum', 'outbound_sum'))
+                counts = np.array([row[2] for row in rows], dtype=np.float64)
+                rates = np.array([(row[3], row[4]) for row in rows], dtype=np.float64).reshape(-1, 2) / counts[:, None]
+            else:
+                rows = list(Data.objects.filter(
+                    circuit_id__in=[circuit_id for circuit_id, _ in circuits],
+                    time__range=(start_date, end_date)
+                ).order_by('circuit_id', 'time').values_list('circuit_id', 'time', 'inbound_rate', 'outbound_rate'))
+                rates = np.array([(row[2], row[3]) for row in rows], dtype=np.float64).reshape(-1, 2)
+            circuit_column = np.array([row[0] for row in rows], dtype=np.int64)
+            times = np.array([row[1].timestamp() for row in rows], dtype=np.float64).astype(np.int64)
+
+            # Add the rows of archived days, read from the cold archive
+            if rollup is None and archived_days_between(start_date, end_date):
+                archived = read_range(start_date, end_date, {circuit_id for circuit_id, _ in circuits})
+                circuit_column = np.concatenate([circuit_column, archived['circuit']])
+                times = np.concatenate([times, archived['time']])
+                rates = np.concatenate([rates, np.column_stack([archived['inbound'], archived['outbound']])])
+
+            return JsonResponse(
+                series_blocks(circuits, circuit_column, times, rates, measurement_unit, integral=rollup is None),
+                safe=False
+            )
+        else:
+            return HttpResponseBadRequest("Invalid request method for 'series'. Use GET.")
 
     # Handle the 'list-top' method
     elif method == 'list-top':
@@ -208,20 +788,19 @@ def dataApi(request, method=None):
                     safe=False
                 )
 
-            # Apply defaults
-            latest_time = Data.objects.latest('time').time if Data.objects.exists() else None
-            if not start_date:
-                start_date = latest_time
-            if not end_date:
-                end_date = latest_time
-
             # Convert start_date and end_date to datetime objects
             try:
-                start_date = parse_datetime(start_date)
-                end_date = parse_datetime(end_date)
+                start_date = parse_datetime(start_date) if start_date else None
+                end_date = parse_datetime(end_date) if end_date else None
             except:
                 return JsonResponse("Invalid date format.", status=400, safe=False)
 
+            # Apply defaults: the time of the newest sample
+            if not start_date or not end_date:
+                latest_time = latest_sample_time()
+                start_date = start_date or latest_time
+                end_date = end_date or latest_time
+
             # Validate 'order_by' parameter
             if order_by not in ['asc', 'desc']:
                 return JsonResponse(
@@ -240,43 +819,37 @@ def dataApi(request, method=None):
                     safe=False
                 )
 
-            # Filter Data objects
-            data_queryset = Data.objects.all()
-            if start_date and end_date:
-                data_queryset = data_queryset.filter(time__range=(start_date, end_date))
-
-            # Filter queryset based on user permissions
-            data_queryset = filter_queryset_for_user(user, data_queryset)
-
             # Get the measurement unit and provide a default value if None
             measurement_unit = get_measurement_unit()  # It will now default to 'bit' if not found
 
-            # Group by 'name' and compute average of rates
-            data_aggregated = data_queryset.values('name').annotate(
-                avg_inbound_rate=Avg('inbound_rate'),
-                avg_outbound_rate=Avg('outbound_rate')
-            )
+            # Compute the average rates per circuit (filtered by user permissions) from the rollups
+            averages = average_rates_by_circuit(user, start_date, end_date)
+            data_aggregated = [
+                {'circuit': circuit_id, 'avg_inbound_rate': avg_inbound_rate, 'avg_outbound_rate': avg_outbound_rate}
+                for circuit_id, (avg_inbound_rate, avg_outbound_rate) in averages.items()
+            ]
 
             order_field = 'avg_' + value_param
-            if order_by == 'asc':
-                data_aggregated = data_aggregated.order_by(order_field)
-            else:
-                data_aggregated = data_aggregated.order_by('-' + order_field)
-
+            data_aggregated.sort(key=lambda item: item[order_field], reverse=(order_by == 'desc'))
             data_aggregated = data_aggregated[:top_n]
 
+            # Resolve the circuit names of the top rows in one query
+            circuit_names = dict(
+                Circuit.objects.filter(id__in=[item['circuit'] for item in data_aggregated]).values_list('id', 'name')
+            )
+
             results = []
             for idx, item in enumerate(data_aggregated, start=1):
                 # Convert the rates based on measurement unit
-                avg_inbound_rate = convert_rate(float(item['avg_inbound_rate']), measurement_unit)
-                avg_outbound_rate = convert_rate(float(item['avg_outbound_rate']), measurement_unit)
+                avg_inbound_rate = convert_rate(item['avg_inbound_rate'], measurement_unit)
+                avg_outbound_rate = convert_rate(item['avg_outbound_rate'], measurement_unit)
 
                 # Round the rates to 3 decimal places
                 avg_inbound_rate = round(avg_inbound_rate, 3)
                 avg_outbound_rate = round(avg_outbound_rate, 3)
 
                 # Map the name to the label from Label model
-                name = get_label_for_circuit(item['name'])
+                name = get_label_for_circuit(circuit_names.get(item['circuit']))
 
                 # Append the modified data to the results
                 results.append({
@@ -288,6 +861,96 @@ def dataApi(request, method=None):
 
             return JsonResponse(results, safe=False)
 
+    # Handle the 'list-latest' method
+    elif method == 'list-latest':
+        if request.method == 'GET':
+            circuit_or_label = request.GET.get('circuit')
+
+            # Current rates: the newest sample of each circuit, one row per circuit
+            latest_queryset = CircuitLatest.objects.all()
+            if circuit_or_label:
+                circuit = get_circuit_from_label_or_name(circuit_or_label)
+                latest_queryset = latest_queryset.filter(circuit__in=circuits_matching(circuit))
+
+            # Filter queryset based on user permissions
+            latest_queryset = filter_queryset_for_user(user, latest_queryset)
+            measurement_unit = get_measurement_unit()
+            time_field = DateTimeField()
+
+            results = []
+            rows = latest_queryset.order_by('circuit__name').values_list('circuit__name', 'time', 'inbound_rate', 'outbound_rate')
+            for circuit_name, time_obj, inbound_rate, outbound_rate in rows:
+                results.append({
+                    'name': get_label_for_circuit(circuit_name),
+                    'inbound_rate': round(convert_rate(inbound_rate or 0, measurement_unit), 3),
+                    'outbound_rate': round(convert_rate(outbound_rate or 0, measurement_unit), 3),
+                    'time': time_field.to_representation(time_obj),
+                })
+
+            return JsonResponse(results, safe=False)
+        else:
+            return HttpResponseBadRequest("Invalid request method for 'list-latest'. Use GET.")
+
+    # Handle the 'percentile' method
+    elif method == 'percentile':
+        if request.method == 'GET':
+            # Get parameters
+            start_date = request.GET.get('start_date')
+            end_date = request.GET.get('end_date')
+            circuit_or_label = request.GET.get('circuit')
+            q = request.GET.get('q', 95)
+
+            # Validate 'q' (a percentile, 95 for the 95th percentile)
+            try:
+                q = float(q)
+                if not 0 < q <= 100:
+                    raise ValueError
+            except ValueError:
+                return JsonResponse(
+                    "Invalid 'q' parameter. Must be a number greater than 0 and at most 100.",
+                    status=400,
+                    safe=False
+                )
+
+            # Convert start_date and end_date to datetime objects
+            try:
+                start_date = parse_datetime(start_date) if start_date else None
+                end_date = parse_datetime(end_date) if end_date else None
+            except:
+                return JsonResponse("Invalid date format.", status=400, safe=False)
+
+            # Apply defaults: the time of the newest sample
+            if not start_date or not end_date:
+                latest_time = latest_sample_time()
+                start_date = start_date or latest_time
+                end_date = end_date or latest_time
+            if not start_date or not end_date:
+                return JsonResponse([], safe=False)
+
+            # Merge the sketches of each circuit (filtered by user permissions) over the range;
+            # the percentiles are within 1% of the ones computed from the sorted raw rates
+            circuit = get_circuit_from_label_or_name(circuit_or_label) if circuit_or_label else None
+            sketches = rate_sketches_by_circuit(user, start_date, end_date, circuit)
+            circuit_names = dict(Circuit.objects.filter(id__in=list(sketches)).values_list('id', 'name'))
+            measurement_unit = get_measurement_unit()
+
+            results = []
+            for circuit_id, (inbound_sketch, outbound_sketch) in sketches.items():
+                inbound_rate = sketch_quantile(inbound_sketch, q / 100)
+                outbound_rate = sketch_quantile(outbound_sketch, q / 100)
+                results.append({
+                    'name': get_label_for_circuit(circuit_names.get(circuit_id)),
+                    'q': q,
+                    'samples': max(sum(inbound_sketch.values()), sum(outbound_sketch.values())),
+                    'inbound_rate': round(convert_rate(inbound_rate, measurement_unit), 3) if inbound_rate is not None else None,
+                    'outbound_rate': round(convert_rate(outbound_rate, measurement_unit), 3) if outbound_rate is not None else None,
+                })
+            results.sort(key=lambda item: item['name'] or '')
+
+            return JsonResponse(results, safe=False)
+        else:
+            return HttpResponseBadRequest("Invalid request method for 'percentile'. Use GET.")
+
     # Handle the 'delete' method
     elif method == 'delete':
         if not user.is_superuser and not user.groups.filter(name='Administrator').exists():
@@ -318,7 +981,10 @@ def dataApi(request, method=None):
                 # Delete single record by id
                 try:
                     data = Data.objects.get(id=data_id)
-                    data.delete()
+                    with transaction.atomic():
+                        data.delete()
+                        update_rollups([(data.circuit_id, data.time)])
+                        refresh_latest([data.circuit_id])
                     # Log the deletion
                     ActivityLog.objects.create(
                         user=user,
@@ -331,45 +997,35 @@ def dataApi(request, method=None):
                     return JsonResponse("Data deleted successfully.", safe=False)
                 except Data.DoesNotExist:
                     return JsonResponse("Data not found.", safe=False)
-            elif circuit_or_label:
-                # Get the circuit (name) from either label or name
-                circuit = get_circuit_from_label_or_name(circuit_or_label)
-                # Filter queryset based on user permissions
-                data_queryset = filter_queryset_for_user(user, Data.objects.filter(name__icontains=circuit))
-                
-                count_deleted = data_queryset.count()
-                if count_deleted == 0:
-                    return JsonResponse("Data not found.", safe=False)
-                ids_deleted = list(data_queryset.values_list('id', flat=True))
-                data_queryset.delete()
-                # Log the deletion
-                ActivityLog.objects.create(
-                    user=user,
-                    method='delete',
-                    module='iPM',
-                    model='Data',
-                    changes=f"{count_deleted} records with name containing '{circuit}' deleted. IDs: {ids_deleted}"
-                )
-                return JsonResponse(f"{count_deleted} record(s) deleted successfully.", safe=False)
-            elif start_date and end_date:
-                # Filter queryset based on user permissions
-                data_queryset = filter_queryset_for_user(user, Data.objects.filter(time__range=(start_date, end_date)))
-
-                count_deleted = data_queryset.count()
-                if count_deleted == 0:
-                    return JsonResponse("Data not found.", safe=False)
-                ids_deleted = list(data_queryset.values_list('id', flat=True))
-                data_queryset.delete()
-                # Log the deletion
-                ActivityLog.objects.create(
-                    user=user,
-                    method='delete',
-                    module='iPM',
-                    model='Data',
-                    changes=f"{count_deleted} records between {start_date} and {end_date} deleted. IDs: {ids_deleted}"
-                )
-                return JsonResponse(f"{count_deleted} record(s) deleted successfully.", safe=False)
+            elif circuit_or_label or (start_date and end_date):
+                # Bulk deletes run in the background in chunks (see apps/iPM/deletes.py),
+                # follow them with the 'delete-status' method; they are logged when done
+                if circuit_or_label:
+                    filters = {'circuit': get_circuit_from_label_or_name(circuit_or_label)}
+                else:
+                    filters = {'start_date': start_date.isoformat(), 'end_date': end_date.isoformat()}
+                job = start_delete_job(user, filters)
+                return JsonResponse(DeleteJobSerializer(job).data, status=202, safe=False)
             else:
                 return JsonResponse("No valid parameters provided for deletion.", safe=False)
         else:
             return HttpResponseBadRequest("Invalid request method for 'delete'. Use DELETE.")
+
+    # Handle the 'delete-status' method
+    elif method == 'delete-status':
+        if not user.is_superuser and not user.groups.filter(name='Administrator').exists():
+            return JsonResponse("Permission denied.", status=403, safe=False)
+        if request.method == 'GET':
+            job_id = request.GET.get('job')
+            if job_id:
+                try:
+                    job = DeleteJob.objects.get(id=job_id)
+                except (DeleteJob.DoesNotExist, ValueError):
+                    return JsonResponse("Delete job not found.", status=404, safe=False)
+                return JsonResponse(DeleteJobSerializer(job).data, safe=False)
+
+            # Without a job id, list the most recent jobs
+            jobs = DeleteJob.objects.order_by('-id')[:20]
+            return JsonResponse(DeleteJobSerializer(jobs, many=True).data, safe=False)
+        else:
+            return HttpResponseBadRequest("Invalid request method for 'delete-status'. Use GET.")
@@ -0,0 +1,99 @@
+import json
+import base64
+from django.http.response import JsonResponse
+from django.utils.dateparse import parse_datetime
+
+# Keyset (cursor) pagination of the list endpoints. A page is requested with 'limit' and,
+# after the first one, the 'cursor' returned with the previous page. The cursor holds the
+# key of the last row sent, (time, id) or (id,), and the next page is read as a range of the
+# index starting just after it: page N costs the same as page 1, unlike OFFSET.
+
+# Rows per page when only 'cursor' is given, and the largest 'limit' accepted
+DEFAULT_LIMIT = 1000
+MAX_LIMIT = 10000
+
+
+def encode_cursor(key):
+    """Return the opaque cursor of a (time, id) or (id,) key."""
+    values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in key]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor, fields):
+    """
+    Return the key of a cursor made by encode_cursor for the given key fields, ('time', 'id')
+    or ('id',). Raises ValueError for any other text.
+    """
+    values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise ValueError(cursor)
+    key = []
+    for field, value in zip(fields, values):
+        if field == 'id':
+            if not isinstance(value, int) or isinstance(value, bool):
+                raise ValueError(cursor)
+            key.append(value)
+        else:
+            time_value = parse_datetime(value) if isinstance(value, str) else None
+            if time_value is None:
+                raise ValueError(cursor)
+            key.append(time_value)
+    return tuple(key)
+
+
+def page_params(request, fields=('id',)):
+    """
+    Return the (limit, key) of a page request, with a None key for the first page, or None
+    when neither 'limit' nor 'cursor' is given (the whole list, as before pagination).
+    Returns an error message (str) when a parameter is invalid.
+    """
+    limit = request.GET.get('limit')
+    cursor = request.GET.get('cursor')
+    if limit is None and cursor is None:
+        return None
+    try:
+        limit = int(limit) if limit is not None else DEFAULT_LIMIT
+        if not 1 <= limit <= MAX_LIMIT:
+            raise ValueError
+    except ValueError:
+        return f"Invalid 'limit' parameter. Must be an integer between 1 and {MAX_LIMIT}."
+    try:
+        key = decode_cursor(cursor, fields) if cursor else None
+    except ValueError:  # Also bad base64, JSON and UTF-8
+        return "Invalid 'cursor' parameter."
+    return limit, key
+
+
+def after_key(queryset, key, fields=('id',)):
+    """
+    Order a queryset by the key fields and keep the rows after the key (all of them for
+    None). With (time, id), rows are read as a range on the time index, skipping the rows
+    of the key's time already sent.
+    """
+    queryset = queryset.order_by(*fields)
+    if key is None:
+        return queryset
+    if len(fields) == 1:
+        return queryset.filter(**{f'{fields[0]}__gt': key[0]})
+    time_field, id_field = fields
+    return queryset.filter(**{f'{time_field}__gte': key[0]}).exclude(**{time_field: key[0], f'{id_field}__lte': key[1]})
+
+
+def keyset_page(queryset, limit, key, fields=('id',)):
+    """
+    Return the objects of one page of a queryset and the key of the next page (None after
+    the last one). One row more than the page is read to know whether another page follows.
+    """
+    rows = list(after_key(queryset, key, fields)[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, tuple(getattr(rows[-1], field) for field in fields)
+
+
+def page_response(results, next_key):
+    """Return a page: its results and the cursor of the next page (None after the last one)."""
+    return JsonResponse({
+        'results': results,
+        'next_cursor': encode_cursor(next_key) if next_key is not None else None,
+    })
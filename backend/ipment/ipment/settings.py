@@ -170,6 +170,10 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static/')
 
+# Cold archive of old Data rows (see `python manage.py archive_data`), one file per UTC day.
+# It must be readable by the web workers, not only by the user running the command.
+IPM_ARCHIVE_DIR = config('IPM_ARCHIVE_DIR', default='/var/lib/ipm-archive')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 